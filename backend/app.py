@@ -6,19 +6,68 @@ Integrates the production-ready processing engine (98.9% accuracy) with the web
 
 import os
 import sys
+import atexit
+import hmac
 import json
+import math
+import heapq
+import re
+import time
 import uuid
+import zipfile
 import shutil
+import signal
+import hashlib
+import pstats
 import subprocess
+import tempfile
+import threading
+import contextvars
+import functools
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, g, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+import numpy as np
 import pandas as pd
 
+# Optional: process resource usage (not available on Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Optional: compact binary result sidecars (falls back to JSON)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Optional: faster constant-memory workbook writer (falls back to openpyxl write-only mode)
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Optional: dictionary-backed Indonesian stemmer for search (falls back to the rule-based one)
+try:
+    from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
+    sastrawi_stemmer = StemmerFactory().create_stemmer()
+except ImportError:
+    sastrawi_stemmer = None
+
+# Optional: page-level PDF splitting (falls back to whole-document processing)
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
 # Project root for subprocess calls to the working core system
 project_root = str(Path(__file__).parent.parent.parent)
 
@@ -28,16 +77,59 @@ CORS(app)  # Enable CORS for React frontend
 # Configuration
 UPLOAD_FOLDER = Path(__file__).parent / 'uploads'
 OUTPUT_FOLDER = Path(__file__).parent / 'outputs'
+PAGE_CACHE_FOLDER = OUTPUT_FOLDER / 'page_cache'
+OUTPUT_XLSX_PATH = Path(__file__).parent.parent / 'web-output' / 'output.xlsx'
+DATASET_META_PATH = OUTPUT_XLSX_PATH.with_name('output_meta.json')
+SNAPSHOT_FOLDER = OUTPUT_XLSX_PATH.parent / 'snapshots'
+GCG_MAPPING_PATH = Path(__file__).parent / 'GCG_MAPPING.csv'
 ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'pdf', 'png', 'jpg', 'jpeg'}
 
+PROCESSOR_TIMEOUT = 180  # seconds per core system run (OCR is slow)
+PDF_PAGES_PER_CHUNK = 1  # pages handed to one core system run
+OCR_JOB_SLOTS = max(1, (os.cpu_count() or 1) // 4)  # PDF/image documents processed at once
+PAGE_WORKERS = max(1, (os.cpu_count() or 1) // OCR_JOB_SLOTS)  # concurrent core system runs per document; all OCR slots together use every core
+PAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # least recently used page results are evicted beyond this
+PAGE_CACHE_MAX_AGE = 30 * 24 * 3600  # seconds an unused page result is kept
+PROCESSOR_IDENTITY_PATHS = ['main_new.py', 'config']  # core system code/config (relative to project_root) that invalidates the page cache
+
 # Ensure directories exist
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 OUTPUT_FOLDER.mkdir(exist_ok=True)
+PAGE_CACHE_FOLDER.mkdir(exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER)
 app.config['OUTPUT_FOLDER'] = str(OUTPUT_FOLDER)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Admission control for processing jobs: cheap Excel jobs and OCR jobs get separate lanes.
+# Memory is reserved per core system process; an OCR job runs PAGE_WORKERS of them.
+app.config['ADMISSION_LANES'] = {
+    'excel': {'slots': max(2, (os.cpu_count() or 1) // 2), 'max_queued': 16, 'processes': 1, 'process_memory_mb': 256, 'expected_seconds': 10},
+    'ocr': {'slots': OCR_JOB_SLOTS, 'max_queued': 4, 'processes': PAGE_WORKERS, 'process_memory_mb': 1024, 'expected_seconds': 120}
+}
+app.config['ADMISSION_MEMORY_FRACTION'] = 0.75  # share of physical memory processing jobs may reserve
+app.config['ADMISSION_MAX_WAIT'] = 30  # seconds a request may queue for a slot before getting 429
+
+# Opt-in request profiling (X-Profile header or ?profile=1), only with the admin token
+app.config['PROFILE_ADMIN_TOKEN'] = os.environ.get('GCG_PROFILE_TOKEN')
+app.config['PROFILE_SAMPLE_INTERVAL'] = 0.005  # seconds between stack samples
+app.config['PROFILE_MAX_STORED'] = 20  # most recent profiles kept in memory
+
+# Write output.xlsx on a background thread (saves return before the workbook is on disk)
+app.config['WORKBOOK_WRITE_BEHIND'] = os.environ.get('GCG_WRITE_BEHIND') == '1'
+
+# Read results from the core system's NDJSON channel (--ndjson) instead of its xlsx output
+app.config['PROCESSOR_STRUCTURED_OUTPUT'] = True
+
+# Per-job limits for core system runs (POSIX only, 0 disables a limit). The resident memory
+# limit (process plus children, Linux) defaults to what admission reserves per OCR process.
+app.config['PROCESSOR_MEMORY_LIMIT_MB'] = int(os.environ.get(
+    'GCG_PROCESSOR_MEMORY_MB', app.config['ADMISSION_LANES']['ocr']['process_memory_mb']
+))
+app.config['PROCESSOR_MEMORY_POLL'] = 0.25  # seconds between resident memory checks
+app.config['PROCESSOR_CPU_LIMIT'] = int(os.environ.get('GCG_PROCESSOR_CPU_SECONDS', PROCESSOR_TIMEOUT))  # CPU seconds
+app.config['PROCESSOR_NICE'] = 10  # keep interactive requests ahead of OCR jobs
+
 def allowed_file(filename: str) -> bool:
     """Check if file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -53,6 +145,846 @@ def get_file_type(filename: str) -> str:
         return 'image'
     return 'unknown'
 
+# Set while a profiled request runs; the core system is then run under cProfile
+processor_profile_dir: contextvars.ContextVar[Optional[Path]] = contextvars.ContextVar('processor_profile_dir', default=None)
+
+def core_processor_command(input_path: Path, *args: str) -> List[str]:
+    """Command line for the core system, run under cProfile while a profiled request is active."""
+    cmd = [sys.executable, "main_new.py", "-i", str(input_path), *args, "-v"]
+    profile_dir = processor_profile_dir.get()
+    if profile_dir is not None:
+        profile_path = profile_dir / f"{input_path.stem}_{uuid.uuid4().hex[:8]}.prof"
+        cmd[1:1] = ["-m", "cProfile", "-o", str(profile_path)]
+    return cmd
+
+# Applies the CPU limit and niceness in the child and then execs the real command. A
+# launcher is used instead of preexec_fn, which is unsafe while page worker threads are running.
+PROCESSOR_LAUNCHER = """
+import os, resource, sys
+cpu, niceness = (int(value) for value in sys.argv[1:3])
+if cpu > 0:
+    ceiling = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    soft, hard = cpu, cpu + 5
+    if ceiling != resource.RLIM_INFINITY:
+        soft, hard = min(soft, ceiling), min(hard, ceiling)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+if niceness > 0:
+    os.nice(niceness)
+os.execv(sys.executable, [sys.executable] + sys.argv[3:])
+"""
+
+def isolated_command(cmd: List[str]) -> List[str]:
+    """Wrap a core system command so it runs under the configured CPU limit and niceness."""
+    if resource is None or os.name != 'posix' or cmd[0] != sys.executable:
+        return cmd
+    return [
+        sys.executable, "-c", PROCESSOR_LAUNCHER,
+        str(app.config['PROCESSOR_CPU_LIMIT']),
+        str(app.config['PROCESSOR_NICE']),
+        *cmd[1:]
+    ]
+
+def job_environment(job_tmp: Path) -> Dict[str, str]:
+    """Environment for one core system run with a private temp directory."""
+    return {**os.environ, 'TMPDIR': str(job_tmp), 'TEMP': str(job_tmp), 'TMP': str(job_tmp)}
+
+def process_tree_rss(pid: int) -> int:
+    """Resident memory in bytes of a process and all its descendants (Linux /proc)."""
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f'/proc/{current}/statm') as statm:
+                total += int(statm.read().split()[1]) * page_size
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as children:
+                    stack.extend(int(child) for child in children.read().split())
+        except (OSError, ValueError, IndexError):
+            continue  # exited meanwhile
+    return total
+
+def kill_process_tree(process: subprocess.Popen):
+    """Kill a core system run together with the helpers it started (OCR engines)."""
+    if os.name == 'posix':
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    else:
+        process.kill()
+
+class ProcessMemoryWatch:
+    """
+    Resident memory limit for one core system run.
+
+    Polls the RSS of the process tree and kills it once it goes over the
+    limit. Unlike RLIMIT_AS this ignores reserved but untouched address space
+    (OCR/BLAS thread pools) and covers child processes. Only enforced where
+    /proc is available.
+    """
+    
+    def __init__(self, process: subprocess.Popen, limit_bytes: int, interval: float):
+        self.process = process
+        self.limit_bytes = limit_bytes
+        self.interval = interval
+        self.exceeded = False
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        if limit_bytes > 0 and os.path.exists('/proc/self/statm'):
+            self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval) and self.process.poll() is None:
+            rss = process_tree_rss(self.process.pid)
+            self.peak = max(self.peak, rss)
+            if rss > self.limit_bytes:
+                self.exceeded = True
+                kill_process_tree(self.process)
+                return
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+class IsolatedRun:
+    """A running core system process with its private temp directory and memory watch."""
+    
+    def __init__(self, cmd: List[str], **popen_kwargs):
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix='gcg-job-'))
+        try:
+            self.process = subprocess.Popen(
+                isolated_command(cmd), cwd=project_root, env=job_environment(self.tmp_dir),
+                start_new_session=os.name == 'posix', text=True, **popen_kwargs
+            )
+        except OSError:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            raise
+        self.memory = ProcessMemoryWatch(
+            self.process, app.config['PROCESSOR_MEMORY_LIMIT_MB'] * 1024 * 1024, app.config['PROCESSOR_MEMORY_POLL']
+        )
+    
+    def kill(self):
+        kill_process_tree(self.process)
+    
+    def finish(self) -> Optional[str]:
+        """Clean up after the process exited; returns the limit it exceeded, if any."""
+        self.memory.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        return exceeded_limit(self.process.returncode, self.memory.exceeded)
+
+class ProcessorRun(subprocess.CompletedProcess):
+    """CompletedProcess of a core system run plus the per-job limit it exceeded."""
+    
+    def __init__(self, args, returncode: int, stdout: str, stderr: str, limit_exceeded: Optional[str] = None):
+        super().__init__(args, returncode, stdout, stderr)
+        self.limit_exceeded = limit_exceeded
+
+def exceeded_limit(returncode: Optional[int], memory_exceeded: bool) -> Optional[str]:
+    """Which per-job limit ('memory' or 'cpu') stopped a core system run, if any."""
+    if memory_exceeded:
+        return 'memory'
+    if resource is not None and returncode == -getattr(signal, 'SIGXCPU', 0) and app.config['PROCESSOR_CPU_LIMIT'] > 0:
+        return 'cpu'
+    return None
+
+def processor_failure(returncode: int, limit: Optional[str]) -> Dict[str, Any]:
+    """Error fields for a failed core system run, naming the exceeded limit."""
+    if limit == 'memory':
+        error = f"Core system exceeded its memory limit ({app.config['PROCESSOR_MEMORY_LIMIT_MB']} MB resident) and was stopped"
+    elif limit == 'cpu':
+        error = f"Core system exceeded its CPU time limit ({app.config['PROCESSOR_CPU_LIMIT']}s) and was stopped"
+    else:
+        error = f'Core system failed with code {returncode}'
+    if limit:
+        print(f"⚠️ {error}")
+    return {'error': error, 'limit_exceeded': limit}
+
+def run_core_processor(input_path: Path, output_path: Path, timeout: int = PROCESSOR_TIMEOUT) -> ProcessorRun:
+    """Run the core system (main_new.py) on a single input file."""
+    cmd = core_processor_command(input_path, "-o", str(output_path))
+    print(f"🔧 DEBUG: Running command: {' '.join(cmd)}")
+    run = IsolatedRun(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        stdout, stderr = run.process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        run.kill()
+        run.process.communicate()
+        raise
+    finally:
+        limit = run.finish()
+    return ProcessorRun(cmd, run.process.returncode, stdout, stderr, limit)
+
+# Whether the core system understands --ndjson (None until the first structured run)
+processor_capabilities: Dict[str, Optional[bool]] = {'ndjson': None}
+
+def run_core_processor_structured(input_path: Path, timeout: int = PROCESSOR_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """
+    Run the core system in structured mode and read its result from the stdout pipe.
+
+    With --ndjson every stdout line that is a JSON object is a record:
+    {"type": "meta", "format", "year", "penilai", "confidence", "columns"},
+    {"type": "stage", "name", "seconds"} per processing stage and
+    {"type": "row", "data": {...}} per table row. Other lines are the verbose
+    log. Returns None when the core system does not support structured mode,
+    so the caller falls back to the xlsx output.
+    """
+    if not app.config['PROCESSOR_STRUCTURED_OUTPUT'] or processor_capabilities['ndjson'] is False:
+        return None
+    
+    cmd = core_processor_command(input_path, "--ndjson")
+    print(f"🔧 DEBUG: Running command: {' '.join(cmd)}")
+    run = IsolatedRun(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=1)
+    process = run.process
+    timed_out = threading.Event()
+    
+    def kill():
+        timed_out.set()
+        run.kill()
+    
+    watchdog = threading.Timer(timeout, kill)
+    watchdog.start()
+    # Drain stderr concurrently so a chatty processor cannot block on a full pipe
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+    
+    metadata, stages, rows, log_lines = {}, [], [], []
+    try:
+        for line in process.stdout:
+            record = None
+            if line.startswith('{'):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    pass
+            if not isinstance(record, dict):
+                log_lines.append(line.rstrip('\n'))
+            elif record.get('type') == 'row':
+                rows.append(record.get('data', {}))
+            elif record.get('type') == 'stage':
+                stages.append({'name': record.get('name'), 'seconds': record.get('seconds')})
+            elif record.get('type') == 'meta':
+                metadata.update({key: value for key, value in record.items() if key != 'type'})
+            else:
+                log_lines.append(line.rstrip('\n'))
+        returncode = process.wait()
+    finally:
+        watchdog.cancel()
+        stderr_reader.join()
+        limit = run.finish()
+    stderr = ''.join(stderr_chunks)
+    
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    # A usage error (argparse exits with 2: unknown --ndjson, missing -o) or a run
+    # without a meta record means the core system has no structured mode
+    if (returncode == 2 and 'usage:' in stderr) or (returncode == 0 and not metadata):
+        print("⚠️ Core system has no structured output mode, using xlsx output")
+        processor_capabilities['ndjson'] = False
+        return None
+    # Other failures say nothing about structured mode: only a successful run confirms it
+    if returncode == 0:
+        processor_capabilities['ndjson'] = True
+    
+    result = {
+        'success': returncode == 0,
+        'structured': True,
+        'metadata': metadata,
+        'stages': stages,
+        'stdout': '\n'.join(log_lines),
+        'stderr': stderr
+    }
+    if returncode == 0:
+        result['frame'] = pd.DataFrame(rows, columns=metadata.get('columns') or None)
+    else:
+        result.update(processor_failure(returncode, limit))
+    return result
+
+def pdf_page_digest(page) -> str:
+    """
+    Hash the content of one PDF page.
+
+    Scanned pages share near-identical content streams ("draw image Im0"),
+    so the XObject streams (the scanned images) are hashed as well.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(page.mediabox).encode())
+    digest.update(str(page.get('/Rotate', 0)).encode())
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources is not None else None
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects.keys()):
+            digest.update(name.encode())
+            digest.update(xobjects[name].get_object().get_data())
+    return digest.hexdigest()
+
+def processing_timeout_error() -> Dict[str, Any]:
+    """Result of a core system run that hit PROCESSOR_TIMEOUT."""
+    return {'success': False, 'error': f'Processing timeout ({PROCESSOR_TIMEOUT}s exceeded)'}
+
+def processor_identity() -> str:
+    """
+    Fingerprint of the core system's code and config.
+
+    Built from the path, size and mtime of every file in PROCESSOR_IDENTITY_PATHS,
+    so updating main_new.py or its config starts a fresh page cache.
+    """
+    digest = hashlib.sha256()
+    for name in PROCESSOR_IDENTITY_PATHS:
+        path = Path(project_root) / name
+        for file in (sorted(path.rglob('*')) if path.is_dir() else [path]):
+            if file.is_file():
+                stat = file.stat()
+                digest.update(f"{file.relative_to(project_root)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+def page_cache_key(identity: str, *content_digests: str) -> str:
+    """Cache key of a page range (or image) for one core system version."""
+    return hashlib.sha256(''.join([identity, *content_digests]).encode()).hexdigest()
+
+def prune_page_cache():
+    """Drop page results unused for PAGE_CACHE_MAX_AGE, then the least recently used beyond PAGE_CACHE_MAX_BYTES."""
+    entries = []
+    now = time.time()
+    for path in PAGE_CACHE_FOLDER.glob('*.xlsx'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        # Partial files belong to a running job until they are older than any run can take
+        max_age = PROCESSOR_TIMEOUT * 2 if '.tmp-' in path.name else PAGE_CACHE_MAX_AGE
+        if now - stat.st_mtime > max_age:
+            path.unlink(missing_ok=True)
+        elif '.tmp-' not in path.name:
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= PAGE_CACHE_MAX_BYTES:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+def process_cached_chunk(chunk_path: Path, cache_key: str) -> Dict[str, Any]:
+    """
+    Process one page range (or image), reusing a cached result for the same content.
+
+    Results are stored as PAGE_CACHE_FOLDER/<cache_key>.xlsx so a retried upload
+    only re-runs the chunks that previously failed or timed out. A hit refreshes
+    the entry's mtime, which prune_page_cache uses as its LRU order.
+    """
+    cached_path = PAGE_CACHE_FOLDER / f"{cache_key}.xlsx"
+    if cached_path.exists():
+        try:
+            os.utime(cached_path)
+            return {'success': True, 'cached': True, 'path': cached_path, 'stdout': ''}
+        except FileNotFoundError:
+            pass  # evicted meanwhile
+
+    partial_path = PAGE_CACHE_FOLDER / f"{cache_key}.tmp-{uuid.uuid4().hex[:8]}.xlsx"
+    try:
+        result = run_core_processor(chunk_path, partial_path)
+    except subprocess.TimeoutExpired:
+        partial_path.unlink(missing_ok=True)
+        return processing_timeout_error()
+
+    if result.returncode != 0 or not partial_path.exists():
+        partial_path.unlink(missing_ok=True)
+        return {
+            'success': False,
+            **processor_failure(result.returncode, result.limit_exceeded),
+            'stdout': result.stdout,
+            'stderr': result.stderr
+        }
+
+    os.replace(partial_path, cached_path)
+    return {'success': True, 'cached': False, 'path': cached_path, 'stdout': result.stdout}
+
+def merge_chunk_results(chunk_paths: List[Path]) -> pd.DataFrame:
+    """
+    Merge per-chunk processed workbooks into one table.
+
+    Rows are keyed by (Type, Section, No); for each key the first non-empty value
+    of every column wins, in page order, so document-level fields detected on the
+    first page (Tahun, Penilai) are carried to the whole result.
+    """
+    frames = [pd.read_excel(str(path)) for path in chunk_paths]
+    frames = [frame for frame in frames if len(frame) > 0]
+    if not frames:
+        return pd.DataFrame()
+
+    merged = pd.concat(frames, ignore_index=True)
+    keys = [col for col in ['Type', 'Section', 'No'] if col in merged.columns]
+    if keys:
+        merged = merged.groupby(keys, sort=False, dropna=False, as_index=False).first()
+
+    for col in ['Tahun', 'Penilai']:
+        if col in merged.columns:
+            present = merged[col].dropna()
+            if len(present) > 0:
+                merged[col] = merged[col].fillna(present.iloc[0])
+    return merged
+
+def process_pdf_pages(input_path: Path, work_dir: Path) -> Optional[Dict[str, Any]]:
+    """
+    Split a PDF into page ranges and run the core system on them in parallel.
+
+    Returns None when the document cannot be split (pypdf missing, encrypted or
+    single-chunk PDF) so the caller falls back to whole-document processing.
+    """
+    if PdfReader is None:
+        return None
+    try:
+        reader = PdfReader(str(input_path))
+        if reader.is_encrypted or len(reader.pages) <= PDF_PAGES_PER_CHUNK:
+            return None
+        page_digests = [pdf_page_digest(page) for page in reader.pages]
+    except Exception as e:
+        print(f"⚠️ Could not split PDF into pages, processing whole document: {e}")
+        return None
+
+    # Write one small PDF per page range, keyed by the hash of its pages' content
+    work_dir.mkdir(parents=True, exist_ok=True)
+    identity = processor_identity()
+    chunks = []
+    for start in range(0, len(reader.pages), PDF_PAGES_PER_CHUNK):
+        end = min(start + PDF_PAGES_PER_CHUNK, len(reader.pages))
+        cache_key = page_cache_key(identity, *page_digests[start:end])
+        chunk_path = work_dir / f"pages_{start + 1}-{end}.pdf"
+        if not (PAGE_CACHE_FOLDER / f"{cache_key}.xlsx").exists():
+            writer = PdfWriter()
+            for page in reader.pages[start:end]:
+                writer.add_page(page)
+            with open(chunk_path, 'wb') as chunk_file:
+                writer.write(chunk_file)
+        chunks.append({'pages': f"{start + 1}-{end}", 'path': chunk_path, 'key': cache_key})
+
+    print(f"🔧 DEBUG: Split PDF into {len(chunks)} page range(s), running {min(PAGE_WORKERS, len(chunks))} at a time")
+    # Each chunk runs in its own core system process; threads only wait on them.
+    # Every chunk gets its own copy of the request context (profiling state).
+    contexts = [contextvars.copy_context() for _ in chunks]
+    with ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, len(chunks))) as pool:
+        results = list(pool.map(
+            lambda job: job[0].run(process_cached_chunk, job[1]['path'], job[1]['key']),
+            zip(contexts, chunks)
+        ))
+
+    failed_pages = [chunk['pages'] for chunk, result in zip(chunks, results) if not result['success']]
+    stdout = '\n'.join(
+        f"--- pages {chunk['pages']}{' (cached)' if result.get('cached') else ''} ---\n{result.get('stdout', '')}"
+        for chunk, result in zip(chunks, results)
+    )
+    page_summary = {
+        'total_chunks': len(chunks),
+        'cached_chunks': sum(1 for result in results if result.get('cached')),
+        'failed_pages': failed_pages,
+        'limits_exceeded': {
+            chunk['pages']: result['limit_exceeded']
+            for chunk, result in zip(chunks, results) if result.get('limit_exceeded')
+        }
+    }
+
+    if failed_pages:
+        limited = ''.join(
+            f"; pages {pages} exceeded the {limit} limit"
+            for pages, limit in page_summary['limits_exceeded'].items()
+        )
+        return {
+            'success': False,
+            'error': f"Core system failed on pages {', '.join(failed_pages)}{limited}; retry to process only these pages",
+            'stdout': stdout,
+            'stderr': '\n'.join(result.get('stderr') or result.get('error', '') for result in results if not result['success']),
+            'pages': page_summary
+        }
+
+    # The workbook itself is only written when someone downloads it
+    merged_df = merge_chunk_results([result['path'] for result in results])
+    return {'success': True, 'frame': merged_df, 'stdout': stdout, 'pages': page_summary}
+
+def process_document(input_path: Path, output_path: Path, file_type: str) -> Dict[str, Any]:
+    """
+    Process an uploaded document with the core system.
+
+    Multi-page PDFs are fanned out per page range; images are cached by content
+    hash; Excel files go straight to the core system, through its structured
+    output channel when it has one. Successful results carry the extracted
+    table as 'frame'; output_path only exists if the core system wrote it.
+    """
+    work_dir = input_path.parent / f"{input_path.stem}_pages"
+    try:
+        result = None
+        if file_type == 'pdf':
+            result = process_pdf_pages(input_path, work_dir)
+        elif file_type == 'image':
+            cache_key = page_cache_key(processor_identity(), hashlib.sha256(input_path.read_bytes()).hexdigest())
+            result = process_cached_chunk(input_path, cache_key)
+            if result['success']:
+                result['frame'] = pd.read_excel(str(result.pop('path')))
+
+        if result is None:
+            result = run_core_processor_structured(input_path)
+        if result is None:
+            completed = run_core_processor(input_path, output_path)
+            result = {
+                'success': completed.returncode == 0,
+                'stdout': completed.stdout,
+                'stderr': completed.stderr
+            }
+            if completed.returncode != 0:
+                result.update(processor_failure(completed.returncode, completed.limit_exceeded))
+            elif output_path.exists():
+                result['frame'] = pd.read_excel(str(output_path))
+        return result
+    except subprocess.TimeoutExpired:
+        return processing_timeout_error()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if file_type in {'pdf', 'image'}:
+            prune_page_cache()
+
+def total_memory_bytes() -> Optional[int]:
+    """Physical memory of the machine, or None where sysconf is unavailable (Windows)."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+class AdmissionController:
+    """
+    Bounded admission for processing jobs.
+
+    Each lane has its own concurrency slots and queue limit, so Excel jobs are
+    never stuck behind OCR jobs. Running jobs also reserve an estimated memory
+    budget against the machine. A request that cannot be admitted within
+    max_wait, or finds the lane queue full, is rejected with a Retry-After
+    estimate derived from the lane's observed job durations.
+    """
+    
+    def __init__(self, lanes: Dict[str, Dict[str, Any]], memory_budget: Optional[int], max_wait: float):
+        self.lanes = {
+            name: {
+                'slots': config['slots'],
+                'max_queued': config['max_queued'],
+                'job_memory': config['processes'] * config['process_memory_mb'] * 1024 * 1024,
+                'expected_seconds': config['expected_seconds'],
+                'running': 0,
+                'waiting': 0,
+                'rejected': 0,
+                'durations': deque(maxlen=50)
+            }
+            for name, config in lanes.items()
+        }
+        self.memory_budget = memory_budget
+        self.memory_reserved = 0
+        self.max_wait = max_wait
+        self.condition = threading.Condition()
+    
+    def _can_start(self, lane: Dict[str, Any]) -> bool:
+        if lane['running'] >= lane['slots']:
+            return False
+        if self.memory_budget is None or self.memory_reserved == 0:
+            return True
+        return self.memory_reserved + lane['job_memory'] <= self.memory_budget
+    
+    def retry_after(self, lane_name: str) -> int:
+        """Seconds until a slot is likely free: average job duration times the jobs ahead per slot."""
+        lane = self.lanes[lane_name]
+        average = sum(lane['durations']) / len(lane['durations']) if lane['durations'] else lane['expected_seconds']
+        waves = max(1, math.ceil((lane['running'] + lane['waiting'] + 1 - lane['slots']) / lane['slots']))
+        return max(1, math.ceil(average * waves))
+    
+    def acquire(self, lane_name: str) -> Optional[int]:
+        """Admit a job (waiting up to max_wait). Returns None when admitted, else Retry-After seconds."""
+        with self.condition:
+            lane = self.lanes[lane_name]
+            if not self._can_start(lane) and lane['waiting'] >= lane['max_queued']:
+                lane['rejected'] += 1
+                return self.retry_after(lane_name)
+            
+            lane['waiting'] += 1
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while not self._can_start(lane):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        lane['rejected'] += 1
+                        return self.retry_after(lane_name)
+                    self.condition.wait(remaining)
+            finally:
+                lane['waiting'] -= 1
+            
+            lane['running'] += 1
+            self.memory_reserved += lane['job_memory']
+            return None
+    
+    def release(self, lane_name: str, duration: float):
+        """Free the job's slot and record how long it took."""
+        with self.condition:
+            lane = self.lanes[lane_name]
+            lane['running'] -= 1
+            lane['durations'].append(duration)
+            self.memory_reserved -= lane['job_memory']
+            self.condition.notify_all()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of lane occupancy for monitoring."""
+        with self.condition:
+            return {
+                'memory_budget_bytes': self.memory_budget,
+                'memory_reserved_bytes': self.memory_reserved,
+                'lanes': {
+                    name: {
+                        'slots': lane['slots'],
+                        'running': lane['running'],
+                        'waiting': lane['waiting'],
+                        'max_queued': lane['max_queued'],
+                        'job_memory_bytes': lane['job_memory'],
+                        'rejected': lane['rejected'],
+                        'avg_duration_seconds': round(sum(lane['durations']) / len(lane['durations']), 2) if lane['durations'] else None
+                    }
+                    for name, lane in self.lanes.items()
+                }
+            }
+
+_machine_memory = total_memory_bytes()
+admission = AdmissionController(
+    app.config['ADMISSION_LANES'],
+    int(_machine_memory * app.config['ADMISSION_MEMORY_FRACTION']) if _machine_memory else None,
+    app.config['ADMISSION_MAX_WAIT']
+)
+
+class StackSampler:
+    """
+    Sampling profiler for a single request thread.
+
+    A background thread periodically grabs the request thread's stack and
+    counts it in folded form ("outer;inner;leaf"), which flame graph tools
+    (flamegraph.pl, speedscope) read directly.
+    """
+    
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+def folded_processor_profile(profile_path: Path) -> Dict[str, Any]:
+    """
+    Turn a cProfile dump of the core system into folded stacks.
+
+    cProfile records caller edges rather than whole stacks, so each function's
+    own time is attributed to the chain of its heaviest callers.
+    """
+    stats = pstats.Stats(str(profile_path)).stats
+    
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({Path(filename).name}:{line})" if line else name
+    
+    def heaviest_caller(func):
+        callers = stats[func][4]
+        return max(callers, key=lambda caller: callers[caller][3]) if callers else None
+    
+    folded = Counter()
+    for func, (_, _, own_time, _, _) in stats.items():
+        micros = int(own_time * 1_000_000)
+        if micros == 0:
+            continue
+        chain, seen, current = [], set(), func
+        while current is not None and current not in seen and current in stats:
+            seen.add(current)
+            chain.append(label(current))
+            current = heaviest_caller(current)
+        folded[';'.join(reversed(chain))] += micros
+    return {
+        'file': profile_path.name,
+        'unit': 'microseconds',
+        'total_seconds': round(sum(entry[2] for entry in stats.values()), 4),
+        'stacks': dict(folded.most_common())
+    }
+
+stored_profiles: OrderedDict = OrderedDict()
+profiles_lock = threading.Lock()
+
+def store_profile(profile: Dict[str, Any]):
+    """Keep a profile, evicting the oldest beyond PROFILE_MAX_STORED."""
+    with profiles_lock:
+        stored_profiles[profile['id']] = profile
+        while len(stored_profiles) > app.config['PROFILE_MAX_STORED']:
+            stored_profiles.popitem(last=False)
+
+def is_profile_admin() -> bool:
+    token = app.config['PROFILE_ADMIN_TOKEN']
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+def profiling_requested() -> bool:
+    flag = request.headers.get('X-Profile') or request.args.get('profile')
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+@app.before_request
+def start_request_profile():
+    if not profiling_requested():
+        return None
+    if not is_profile_admin():
+        return jsonify({'error': 'Profiling requires a valid X-Admin-Token'}), 403
+    
+    g.profile_id = uuid.uuid4().hex[:12]
+    g.profile_dir = OUTPUT_FOLDER / 'profiles' / g.profile_id
+    g.profile_dir.mkdir(parents=True, exist_ok=True)
+    g.profile_token = processor_profile_dir.set(g.profile_dir)
+    g.profile_started_at = datetime.now().isoformat()
+    g.profile_started = time.perf_counter()
+    g.profile_sampler = StackSampler(threading.get_ident(), app.config['PROFILE_SAMPLE_INTERVAL'])
+    g.profile_sampler.start()
+    return None
+
+def finish_request_profile(status_code: Optional[int]) -> Optional[str]:
+    """Stop the sampler, collect processor profiles and store the result."""
+    sampler = g.pop('profile_sampler', None)
+    if sampler is None:
+        return None
+    sampler.stop()
+    duration = time.perf_counter() - g.profile_started
+    processor_profile_dir.reset(g.profile_token)
+    
+    processor_profiles = []
+    for profile_path in sorted(g.profile_dir.glob('*.prof')):
+        try:
+            processor_profiles.append(folded_processor_profile(profile_path))
+        except Exception as e:
+            processor_profiles.append({'file': profile_path.name, 'error': str(e)})
+    shutil.rmtree(g.profile_dir, ignore_errors=True)
+    
+    store_profile({
+        'id': g.profile_id,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'status': status_code,
+        'started_at': g.profile_started_at,
+        'duration_seconds': round(duration, 4),
+        'sample_interval': sampler.interval,
+        'samples': sampler.samples,
+        'stacks': dict(sampler.stacks.most_common()),
+        'processor_profiles': processor_profiles
+    })
+    return g.profile_id
+
+@app.after_request
+def attach_request_profile(response):
+    profile_id = finish_request_profile(response.status_code)
+    if profile_id:
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.teardown_request
+def discard_request_profile(error=None):
+    # Requests that ended without a response still stop their sampler
+    finish_request_profile(None)
+
+def write_packed(path: Path, payload: Dict[str, Any]):
+    """Write MessagePack (or JSON when msgpack is missing) atomically."""
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    if msgpack is not None:
+        tmp_path.write_bytes(msgpack.packb(payload, use_bin_type=True))
+    else:
+        tmp_path.write_text(json.dumps(payload))
+    os.replace(tmp_path, path)
+
+def read_packed(path: Path) -> Dict[str, Any]:
+    """Read a file written by write_packed (format chosen by its extension)."""
+    if path.suffix == '.msgpack':
+        if msgpack is None:
+            raise RuntimeError(f'msgpack is required to read {path.name}')
+        return msgpack.unpackb(path.read_bytes(), raw=False)
+    return json.loads(path.read_text())
+
+def result_sidecar_path(output_path: Path) -> Path:
+    """Sidecar holding the parsed result next to processed_<id>_<name>.xlsx."""
+    return output_path.with_suffix('.result.msgpack' if msgpack is not None else '.result.json')
+
+def write_result_sidecar(output_path: Path, result: Dict[str, Any]) -> Path:
+    """Store the parsed upload result (MessagePack when available, else JSON) atomically."""
+    sidecar_path = result_sidecar_path(output_path)
+    write_packed(sidecar_path, result)
+    return sidecar_path
+
+def sidecar_workbook_path(sidecar_path: Path) -> Path:
+    """The processed_<id>_<name>.xlsx a result sidecar belongs to."""
+    return sidecar_path.with_name(sidecar_path.name.rsplit('.result.', 1)[0] + '.xlsx')
+
+def table_payload(df: pd.DataFrame) -> Dict[str, Any]:
+    """Extracted table in a compact column/row form for the result sidecar."""
+    return {
+        'columns': [str(col) for col in df.columns],
+        'rows': df.astype(object).where(df.notna(), None).values.tolist()
+    }
+
+def read_result_sidecar(file_id: str) -> Optional[Dict[str, Any]]:
+    """Load the stored parsed result of a processed file, or None if there is none."""
+    for sidecar_path in OUTPUT_FOLDER.glob(f"processed_{file_id}_*.result.*"):
+        if sidecar_path.name.endswith('.result.msgpack') and msgpack is not None:
+            return msgpack.unpackb(sidecar_path.read_bytes(), raw=False)
+        if sidecar_path.name.endswith('.result.json'):
+            return json.loads(sidecar_path.read_text())
+    return None
+
+def processed_workbook_path(file_id: str) -> Optional[Path]:
+    """
+    Path of the processed workbook, writing it from the result sidecar first
+    when the result came from the structured channel and was never downloaded.
+    """
+    for output_file in OUTPUT_FOLDER.glob(f"processed_{file_id}_*.xlsx"):
+        return output_file
+    result = read_result_sidecar(file_id)
+    if result is None or 'table' not in result:
+        return None
+    output_path = OUTPUT_FOLDER / result['processedFilename']
+    write_workbook(pd.DataFrame(result['table']['rows'], columns=result['table']['columns']), output_path, {})
+    print(f"🔧 DEBUG: Wrote {output_path.name} from its result sidecar")
+    return output_path
+
+def processed_outputs() -> List[Tuple[Path, Path]]:
+    """
+    (workbook path, file on disk) per processed output, sorted by workbook name.
+
+    Workbooks not yet written from their result sidecar are included with the
+    sidecar as the file on disk.
+    """
+    outputs = {path: path for path in OUTPUT_FOLDER.glob("processed_*.xlsx")}
+    for sidecar_path in OUTPUT_FOLDER.glob("processed_*.result.*"):
+        if not sidecar_path.name.endswith('.tmp'):
+            outputs.setdefault(sidecar_workbook_path(sidecar_path), sidecar_path)
+    return sorted(outputs.items())
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
@@ -96,6 +1028,21 @@ def upload_file():
         
         print(f"🔧 DEBUG: File validation passed")
         
+        # Admission control: OCR (PDF/image) and Excel jobs queue in separate lanes
+        lane = 'excel' if get_file_type(file.filename) == 'excel' else 'ocr'
+        retry_after = admission.acquire(lane)
+        if retry_after is not None:
+            print(f"🔧 DEBUG: Rejected {lane} job, server busy (retry after {retry_after}s)")
+            response = jsonify({
+                'error': 'Server is busy processing other documents, please retry later',
+                'retryAfter': retry_after
+            })
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
+        job_started = time.monotonic()
+        processed_df = None
+        processing_meta = {}
+        
         try:
             print(f"🔧 DEBUG: Starting file processing...")
             # Generate unique filename
@@ -133,58 +1080,44 @@ def upload_file():
                 print(f"🔧 DEBUG: Processing {file_type} file using core system...")
                 
                 try:
-                    import time
                     start_time = time.time()
                     
-                    # Call the working core system directly as subprocess
-                    cmd = [
-                        sys.executable, "main_new.py",
-                        "-i", str(input_path),
-                        "-o", str(output_path),
-                        "-v"
-                    ]
-                    
-                    print(f"🔧 DEBUG: Running command: {' '.join(cmd)}")
+                    # Call the working core system (PDFs are split into page ranges)
                     print(f"🔧 DEBUG: Working directory: {project_root}")
-                    
-                    result = subprocess.run(
-                        cmd,
-                        cwd=project_root,
-                        capture_output=True,
-                        text=True,
-                        timeout=180  # 3 minute timeout for OCR processing
-                    )
+                    result = process_document(input_path, output_path, file_type)
                     
                     end_time = time.time()
                     print(f"🔧 DEBUG: Core system completed in {end_time - start_time:.2f} seconds")
-                    print(f"🔧 DEBUG: Return code: {result.returncode}")
-                    print(f"🔧 DEBUG: STDOUT: {result.stdout}")
-                    if result.stderr:
-                        print(f"🔧 DEBUG: STDERR: {result.stderr}")
+                    print(f"🔧 DEBUG: STDOUT: {result.get('stdout', '')}")
+                    if result.get('stderr'):
+                        print(f"🔧 DEBUG: STDERR: {result['stderr']}")
                     
-                    if result.returncode == 0:
+                    if result['success']:
                         processing_result = {
                             'success': True,
                             'method': f'{file_type}_processing',
                             'message': 'Processing completed successfully',
-                            'stdout': result.stdout,
+                            'stdout': result.get('stdout', ''),
                             'processing_time': f"{end_time - start_time:.2f}s"
                         }
                     else:
                         processing_result = {
                             'success': False,
                             'method': f'{file_type}_processing',
-                            'error': f'Core system failed with code {result.returncode}',
-                            'stdout': result.stdout,
-                            'stderr': result.stderr
+                            'error': result['error'],
+                            'limit_exceeded': result.get('limit_exceeded'),
+                            'stdout': result.get('stdout', ''),
+                            'stderr': result.get('stderr', '')
                         }
+                    if 'pages' in result:
+                        processing_result['pages'] = result['pages']
+                    if result.get('structured'):
+                        processing_meta = result.get('metadata', {})
+                        processing_result['structured'] = True
+                        processing_result['stages'] = result.get('stages', [])
+                        processing_result['confidence'] = processing_meta.get('confidence')
+                    processed_df = result.get('frame')
                     
-                except subprocess.TimeoutExpired:
-                    processing_result = {
-                        'success': False,
-                        'method': f'{file_type}_processing',
-                        'error': 'Processing timeout (3 minutes exceeded)'
-                    }
                 except Exception as e:
                     print(f"🔧 DEBUG: EXCEPTION in subprocess call: {e}")
                     import traceback
@@ -208,16 +1141,17 @@ def upload_file():
                 'error': f'Processing failed: {str(proc_error)}',
                 'method': 'processing_error'
             }
+        finally:
+            admission.release(lane, time.monotonic() - job_started)
         
         # Load processed results if successful
         extracted_data = None
-        if processing_result['success'] and output_path.exists():
+        if processing_result['success'] and processed_df is not None:
             try:
-                # Read the processed Excel file
-                df = pd.read_excel(str(output_path))
+                # Table extracted by the core system (structured channel or its xlsx output)
+                df = processed_df
                 print(f"🔧 DEBUG: Loaded DataFrame with {len(df)} rows")
                 print(f"🔧 DEBUG: DataFrame columns: {list(df.columns)}")
-                print(f"🔧 DEBUG: DataFrame head:\n{df.head()}")
                 
                 # Extract key metrics
                 indicator_rows = df[df['Type'] == 'indicator'] if 'Type' in df.columns else df
@@ -235,6 +1169,10 @@ def upload_file():
                     'format_type': 'DETAILED' if len(df) > 20 else 'BRIEF',
                     'processing_status': 'success'
                 }
+                # The structured channel reports what the core system detected
+                for key, meta_key in (('year', 'year'), ('penilai', 'penilai'), ('format_type', 'format')):
+                    if processing_meta.get(meta_key) is not None:
+                        extracted_data[key] = str(processing_meta[meta_key])
                 
                 # Extract ALL indicator data (not just samples)
                 if len(indicator_rows) > 0:
@@ -252,103 +1190,16 @@ def upload_file():
                         })
                     extracted_data['sample_indicators'] = all_indicators
                     
-                # Add sheet analysis for XLSX files and extract BRIEF data for aspect summary
-                if file_type == 'excel':
+                    # Match the (OCR-noisy) indicators against the canonical GCG mapping in one pass
                     try:
-                        # Read Excel file to analyze sheets
-                        excel_file = pd.ExcelFile(str(input_path))
-                        sheet_names = excel_file.sheet_names
-                        
-                        sheet_analysis = {
-                            'total_sheets': len(sheet_names),
-                            'sheet_names': sheet_names,
-                            'sheet_types': {}
-                        }
-                        
-                        brief_sheet_data = None
-                        
-                        # Analyze each sheet to determine if it's BRIEF or DETAILED
-                        for sheet_name in sheet_names:
-                            try:
-                                sheet_df = pd.read_excel(str(input_path), sheet_name=sheet_name)
-                                
-                                # Debug: Print sheet info
-                                print(f"🔧 DEBUG: Analyzing sheet '{sheet_name}' with {len(sheet_df)} rows")
-                                print(f"🔧 DEBUG: Sheet columns: {list(sheet_df.columns)}")
-                                print(f"🔧 DEBUG: First few rows:\n{sheet_df.head()}")
-                                
-                                # Simple heuristic: BRIEF has fewer rows, DETAILED has more
-                                if len(sheet_df) <= 15:
-                                    sheet_type = 'BRIEF'
-                                    
-                                    # Try to extract BRIEF data from any sheet with reasonable data
-                                    if len(sheet_df) >= 3 and len(sheet_df) <= 20:  # More flexible range
-                                        brief_sheet_data = []
-                                        
-                                        print(f"🔧 DEBUG: Attempting BRIEF extraction from sheet '{sheet_name}'")
-                                        
-                                        for idx, row in sheet_df.iterrows():
-                                            # Extract BRIEF data for aspect summary
-                                            brief_row = {}
-                                            
-                                            # More flexible column matching
-                                            for col in sheet_df.columns:
-                                                col_str = str(col).strip()
-                                                col_lower = col_str.lower()
-                                                
-                                                # Match various column patterns
-                                                if any(keyword in col_lower for keyword in ['aspek', 'section', 'aspect']):
-                                                    brief_row['aspek'] = str(row[col]).strip() if pd.notna(row[col]) else ''
-                                                elif any(keyword in col_lower for keyword in ['deskripsi', 'description', 'desc']):
-                                                    brief_row['deskripsi'] = str(row[col]).strip() if pd.notna(row[col]) else ''
-                                                elif any(keyword in col_lower for keyword in ['bobot', 'weight', 'berat']):
-                                                    try:
-                                                        brief_row['bobot'] = float(row[col]) if pd.notna(row[col]) else 0.0
-                                                    except (ValueError, TypeError):
-                                                        brief_row['bobot'] = 0.0
-                                                elif any(keyword in col_lower for keyword in ['skor', 'score', 'nilai']):
-                                                    try:
-                                                        brief_row['skor'] = float(row[col]) if pd.notna(row[col]) else 0.0
-                                                    except (ValueError, TypeError):
-                                                        brief_row['skor'] = 0.0
-                                                elif any(keyword in col_lower for keyword in ['capaian', 'achievement', 'pencapaian']):
-                                                    try:
-                                                        brief_row['capaian'] = float(row[col]) if pd.notna(row[col]) else 0.0
-                                                    except (ValueError, TypeError):
-                                                        brief_row['capaian'] = 0.0
-                                                elif any(keyword in col_lower for keyword in ['penjelasan', 'explanation', 'keterangan']):
-                                                    brief_row['penjelasan'] = str(row[col]).strip() if pd.notna(row[col]) else ''
-                                            
-                                            # Debug: show what we extracted for this row
-                                            print(f"🔧 DEBUG: Row {idx}: {brief_row}")
-                                            
-                                            # Add row if it has meaningful data (aspek is required)
-                                            if brief_row.get('aspek') and brief_row.get('aspek').strip() and brief_row.get('aspek') != 'nan':
-                                                brief_sheet_data.append(brief_row)
-                                        
-                                        print(f"🔧 DEBUG: Successfully extracted {len(brief_sheet_data)} BRIEF summary rows from sheet '{sheet_name}'")
-                                        
-                                else:
-                                    sheet_type = 'DETAILED'
-                                    
-                                sheet_analysis['sheet_types'][sheet_name] = {
-                                    'type': sheet_type,
-                                    'row_count': len(sheet_df),
-                                    'contains_summary_data': len(sheet_df) <= 10 and len(sheet_df) >= 5
-                                }
-                            except Exception as e:
-                                sheet_analysis['sheet_types'][sheet_name] = {
-                                    'type': 'UNKNOWN',
-                                    'error': str(e)
-                                }
-                        
-                        extracted_data['sheet_analysis'] = sheet_analysis
-                        extracted_data['brief_sheet_data'] = brief_sheet_data
-                        
+                        extracted_data['reconciliation'] = reconcile_indicators(all_indicators)
                     except Exception as e:
-                        extracted_data['sheet_analysis'] = {
-                            'error': f'Could not analyze sheets: {str(e)}'
-                        }
+                        print(f"⚠️ Could not reconcile indicators: {e}")
+                    
+                # Sheet analysis (BRIEF/DETAILED per sheet) is computed off the request path
+                if file_type == 'excel':
+                    schedule_sheet_analysis(file_id, input_path, output_path)
+                    extracted_data['sheet_analysis_url'] = f'/api/sheet-analysis/{file_id}'
                 
             except Exception as read_error:
                 extracted_data = {
@@ -372,6 +1223,22 @@ def upload_file():
             }
         }
         
+        # Keep the parsed result next to the processed file so it can be served without re-processing
+        if processing_result['success'] and extracted_data is not None:
+            try:
+                stored_result = dict(response_data)
+                stored_result['processing'] = {
+                    key: value for key, value in processing_result.items() if key not in ('stdout', 'stderr')
+                }
+                # Without an xlsx from the core system the table is kept here until downloaded
+                if processed_df is not None and not output_path.exists():
+                    stored_result['table'] = table_payload(processed_df)
+                write_result_sidecar(output_path, stored_result)
+            except Exception as e:
+                print(f"⚠️ Could not store result sidecar: {e}")
+                if processed_df is not None and not output_path.exists():
+                    write_workbook(processed_df, output_path, {})
+        
         return jsonify(response_data), 200
         
     except Exception as e:
@@ -380,91 +1247,1556 @@ def upload_file():
         print(f"🔧 DEBUG: Full traceback: {traceback.format_exc()}")
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+def analyze_sheets(input_path: Path) -> Dict[str, Any]:
+    """
+    Classify every sheet of an uploaded workbook as BRIEF or DETAILED and
+    extract the BRIEF aspect summary rows.
+    """
+    try:
+        # Read Excel file to analyze sheets
+        excel_file = pd.ExcelFile(str(input_path))
+        sheet_names = excel_file.sheet_names
+        
+        sheet_analysis = {
+            'total_sheets': len(sheet_names),
+            'sheet_names': sheet_names,
+            'sheet_types': {}
+        }
+        
+        brief_sheet_data = None
+        
+        # Analyze each sheet to determine if it's BRIEF or DETAILED
+        for sheet_name in sheet_names:
+            try:
+                sheet_df = excel_file.parse(sheet_name)
+                
+                # Simple heuristic: BRIEF has fewer rows, DETAILED has more
+                if len(sheet_df) <= 15:
+                    sheet_type = 'BRIEF'
+                    
+                    # Try to extract BRIEF data from any sheet with reasonable data
+                    if len(sheet_df) >= 3 and len(sheet_df) <= 20:  # More flexible range
+                        brief_sheet_data = brief_summary_rows(sheet_df)
+                        print(f"🔧 DEBUG: Extracted {len(brief_sheet_data)} BRIEF summary rows from sheet '{sheet_name}'")
+                        
+                else:
+                    sheet_type = 'DETAILED'
+                    
+                sheet_analysis['sheet_types'][sheet_name] = {
+                    'type': sheet_type,
+                    'row_count': len(sheet_df),
+                    'contains_summary_data': len(sheet_df) <= 10 and len(sheet_df) >= 5
+                }
+            except Exception as e:
+                sheet_analysis['sheet_types'][sheet_name] = {
+                    'type': 'UNKNOWN',
+                    'error': str(e)
+                }
+        
+        return {'sheet_analysis': sheet_analysis, 'brief_sheet_data': brief_sheet_data}
+        
+    except Exception as e:
+        return {
+            'sheet_analysis': {'error': f'Could not analyze sheets: {str(e)}'},
+            'brief_sheet_data': None
+        }
+
+def brief_summary_rows(sheet_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Aspect summary rows of a BRIEF sheet, matching columns by (Indonesian or English) name."""
+    # Column -> (field, numeric) resolved once per sheet instead of per row
+    patterns = [
+        (['aspek', 'section', 'aspect'], 'aspek', False),
+        (['deskripsi', 'description', 'desc'], 'deskripsi', False),
+        (['bobot', 'weight', 'berat'], 'bobot', True),
+        (['skor', 'score', 'nilai'], 'skor', True),
+        (['capaian', 'achievement', 'pencapaian'], 'capaian', True),
+        (['penjelasan', 'explanation', 'keterangan'], 'penjelasan', False)
+    ]
+    columns = []
+    for col in sheet_df.columns:
+        col_lower = str(col).strip().lower()
+        for keywords, field, numeric in patterns:
+            if any(keyword in col_lower for keyword in keywords):
+                columns.append((col, field, numeric))
+                break
+    
+    rows = []
+    for _, row in sheet_df.iterrows():
+        brief_row = {}
+        for col, field, numeric in columns:
+            value = row[col]
+            if numeric:
+                try:
+                    brief_row[field] = float(value) if pd.notna(value) else 0.0
+                except (ValueError, TypeError):
+                    brief_row[field] = 0.0
+            else:
+                brief_row[field] = str(value).strip() if pd.notna(value) else ''
+        
+        # Add row if it has meaningful data (aspek is required)
+        if brief_row.get('aspek') and brief_row.get('aspek').strip() and brief_row.get('aspek') != 'nan':
+            rows.append(brief_row)
+    return rows
+
+def sheet_analysis_path(output_path: Path) -> Path:
+    """Memoized sheet analysis next to processed_<id>_<name>.xlsx."""
+    return output_path.with_suffix('.sheets.msgpack' if msgpack is not None else '.sheets.json')
+
+def lower_thread_priority():
+    # Linux applies setpriority to a single thread when given its native id
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+# One low-priority worker: analyses never compete with uploads for more than a core
+sheet_analysis_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sheet-analysis', initializer=lower_thread_priority)
+sheet_analysis_jobs: Dict[str, Any] = {}
+sheet_analysis_lock = threading.Lock()
+
+def run_sheet_analysis(file_id: str, input_path: Path, output_path: Path) -> Dict[str, Any]:
+    """Analyze a workbook once and memoize the result on disk."""
+    memo_path = sheet_analysis_path(output_path)
+    if memo_path.exists():
+        return read_packed(memo_path)
+    analysis = analyze_sheets(input_path)
+    write_packed(memo_path, analysis)
+    print(f"🔧 DEBUG: Memoized sheet analysis of {file_id} as {memo_path.name}")
+    return analysis
+
+def schedule_sheet_analysis(file_id: str, input_path: Path, output_path: Path):
+    """Queue the analysis of an uploaded workbook in the background."""
+    with sheet_analysis_lock:
+        if file_id in sheet_analysis_jobs:
+            return
+        job = sheet_analysis_jobs[file_id] = sheet_analysis_pool.submit(run_sheet_analysis, file_id, input_path, output_path)
+    
+    def forget(_):
+        # Finished analyses are served from their memo file
+        with sheet_analysis_lock:
+            sheet_analysis_jobs.pop(file_id, None)
+    job.add_done_callback(forget)
+
+def get_sheet_analysis(file_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Sheet analysis of an uploaded workbook: memoized, from the background job
+    if one is queued or running, else computed now. None if the upload is unknown.
+    """
+    with sheet_analysis_lock:
+        job = sheet_analysis_jobs.get(file_id)
+    if job is not None:
+        return job.result()
+    
+    uploads = [path for path in UPLOAD_FOLDER.glob(f"{file_id}_*") if get_file_type(path.name) == 'excel']
+    if not uploads:
+        return None
+    input_path = uploads[0]
+    output_path = OUTPUT_FOLDER / f"processed_{input_path.stem}.xlsx"
+    return run_sheet_analysis(file_id, input_path, output_path)
+
+@app.route('/api/sheet-analysis/<file_id>', methods=['GET'])
+def sheet_analysis(file_id: str):
+    """BRIEF/DETAILED sheet analysis and BRIEF summary rows of an uploaded workbook."""
+    try:
+        uuid.UUID(file_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid file id'}), 400
+    
+    try:
+        analysis = get_sheet_analysis(file_id)
+        if analysis is None:
+            return jsonify({'error': 'Uploaded workbook not found'}), 404
+        return jsonify({'fileId': file_id, **analysis}), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Sheet analysis failed: {str(e)}'}), 500
+
+class ZipStreamBuffer:
+    """
+    Write-only, unseekable file object for zipfile.
+
+    zipfile falls back to data descriptors when it cannot seek, so the archive
+    can be handed to the client piece by piece as it is written.
+    """
+    
+    def __init__(self):
+        self.pending = []
+        self.position = 0
+    
+    def write(self, data) -> int:
+        self.pending.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b''.join(self.pending)
+        self.pending = []
+        return data
+
+def select_processed_files(file_ids: Optional[List[str]], date_from: Optional[datetime],
+                           date_to: Optional[datetime], name_filter: Optional[str]) -> List[Tuple[str, str, Path]]:
+    """Processed outputs matching the ids and/or filters that have a workbook, as (file_id, original name, path)."""
+    wanted = set(file_ids) if file_ids else None
+    selected = []
+    for output_file, stored_file in processed_outputs():
+        filename_parts = output_file.stem.split('_', 2)
+        if len(filename_parts) < 3:
+            continue
+        file_id, original_name = filename_parts[1], filename_parts[2]
+        if wanted is not None and file_id not in wanted:
+            continue
+        modified = datetime.fromtimestamp(stored_file.stat().st_mtime)
+        if date_from and modified < date_from:
+            continue
+        if date_to and modified > date_to:
+            continue
+        if name_filter and name_filter.lower() not in original_name.lower():
+            continue
+        if not output_file.exists():
+            output_file = processed_workbook_path(file_id)
+            # A sidecar without its table cannot be turned back into a workbook
+            if output_file is None:
+                print(f"⚠️ Skipping {file_id}: no workbook or table to write it from")
+                continue
+        selected.append((file_id, original_name, output_file))
+    return selected
+
+def stream_zip(files: List[Tuple[str, str, Path]], chunk_size: int = 64 * 1024):
+    """Yield a ZIP archive of the files without holding it in memory or on disk."""
+    buffer = ZipStreamBuffer()
+    # Processed workbooks are already deflated, so entries are stored as-is
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for file_id, original_name, path in files:
+            info = zipfile.ZipInfo(f"{original_name}_{file_id[:8]}.xlsx", date_time=datetime.fromtimestamp(path.stat().st_mtime).timetuple()[:6])
+            with open(path, 'rb') as source, archive.open(info, 'w', force_zip64=True) as entry:
+                while True:
+                    block = source.read(chunk_size)
+                    if not block:
+                        break
+                    entry.write(block)
+                    yield buffer.drain()
+            yield buffer.drain()
+    yield buffer.drain()
+
+@app.route('/api/download/bulk', methods=['GET', 'POST'])
+def download_bulk():
+    """
+    Download many processed files as one streamed ZIP.
+    
+    Select by fileIds (JSON body or comma-separated ?ids=) and/or filters:
+    from/to (ISO dates, file modification time) and filename (substring of
+    the original filename). Without any selector every processed file is sent.
+    """
+    payload = request.get_json(silent=True) or {}
+    file_ids = payload.get('fileIds')
+    if file_ids is None and request.args.get('ids'):
+        file_ids = [file_id.strip() for file_id in request.args['ids'].split(',') if file_id.strip()]
+    date_from = payload.get('from', request.args.get('from'))
+    date_to = payload.get('to', request.args.get('to'))
+    name_filter = payload.get('filename', request.args.get('filename'))
+    
+    try:
+        for file_id in file_ids or []:
+            uuid.UUID(str(file_id))
+        date_from = datetime.fromisoformat(date_from) if date_from else None
+        date_to = datetime.fromisoformat(date_to) if date_to else None
+    except ValueError as e:
+        return jsonify({'error': f'Invalid selection: {str(e)}'}), 400
+    # A bare date as upper bound includes that whole day
+    if date_to and date_to.time() == datetime.min.time():
+        date_to = date_to.replace(hour=23, minute=59, second=59, microsecond=999999)
+    
+    files = select_processed_files(file_ids, date_from, date_to, name_filter)
+    if not files:
+        return jsonify({'error': 'No processed files match the selection'}), 404
+    
+    print(f"🔧 DEBUG: Streaming {len(files)} processed file(s) as ZIP")
+    return Response(
+        stream_with_context(stream_zip(files)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename=GCG_Assessments_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'}
+    )
+
 @app.route('/api/download/<file_id>', methods=['GET'])
 def download_file(file_id: str):
     """Download processed file by ID."""
     try:
-        # Find the processed file
-        for output_file in OUTPUT_FOLDER.glob(f"processed_{file_id}_*.xlsx"):
-            if output_file.exists():
-                return send_file(
-                    str(output_file),
-                    as_attachment=True,
-                    download_name=f"GCG_Assessment_{file_id}.xlsx",
-                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                )
+        # Find the processed file (written from its result sidecar on first download)
+        output_file = processed_workbook_path(file_id)
+        if output_file is not None and output_file.exists():
+            return send_file(
+                str(output_file),
+                as_attachment=True,
+                download_name=f"GCG_Assessment_{file_id}.xlsx",
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
         
         return jsonify({'error': 'File not found'}), 404
         
     except Exception as e:
         return jsonify({'error': f'Download failed: {str(e)}'}), 500
 
+@app.route('/api/result/<file_id>', methods=['GET'])
+def get_result(file_id: str):
+    """Parsed result of a processed file (the upload response), served from its sidecar."""
+    try:
+        uuid.UUID(file_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid file id'}), 400
+    
+    try:
+        result = read_result_sidecar(file_id)
+        if result is None:
+            return jsonify({'error': 'Result not found'}), 404
+        result.pop('table', None)
+        
+        # Include the sheet analysis once it has been memoized, as the upload response used to
+        extracted_data = result.get('extractedData')
+        if result.get('processedFilename') and isinstance(extracted_data, dict):
+            memo_path = sheet_analysis_path(OUTPUT_FOLDER / result['processedFilename'])
+            if memo_path.exists():
+                extracted_data.update(read_packed(memo_path))
+        return jsonify(result), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Could not load result: {str(e)}'}), 500
+
 @app.route('/api/files', methods=['GET'])
 def list_files():
     """List all processed files."""
     try:
-        files = []
+        files = []
+        
+        for output_file, stored_file in processed_outputs():
+            # Extract file ID from filename
+            filename_parts = output_file.name.split('_', 2)
+            if len(filename_parts) >= 2:
+                file_id = filename_parts[1]
+                
+                # Get file stats (of the result sidecar while the workbook is not written yet)
+                stat = stored_file.stat()
+                
+                files.append({
+                    'fileId': file_id,
+                    'filename': output_file.name,
+                    'size': stat.st_size,
+                    'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
+                    'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                    'workbookWritten': output_file == stored_file
+                })
+        
+        return jsonify({'files': files}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to list files: {str(e)}'}), 500
+
+@app.route('/api/system/info', methods=['GET'])
+def system_info():
+    """Get system information and capabilities."""
+    return jsonify({
+        'system': 'POS Data Cleaner 2',
+        'version': '2.0.0',
+        'capabilities': {
+            'file_types': list(ALLOWED_EXTENSIONS),
+            'formats_supported': ['DETAILED (56 rows)', 'BRIEF (13 rows)'],
+            'languages': ['Indonesian'],
+            'years_supported': '2014-2025',
+            'gcg_aspects': ['I-VI (Roman numerals)', 'A-H (Alphabetic)', '1-10 (Numeric)'],
+            'advanced_features': [
+                'Mathematical topology processing',
+                'Quantum superposition layouts', 
+                'DNA helix patterns',
+                'Fractal recursive structures',
+                'Multi-engine OCR (Tesseract + PaddleOCR)',
+                'ML classification (XGBoost + rules)'
+            ]
+        },
+        'processing_pipeline': [
+            'File type detection',
+            'Format classification (DETAILED vs BRIEF)',
+            'Pattern recognition (43+ indicator patterns)', 
+            'Spatial matching (distance-based pairing)',
+            'Manual.xlsx structure generation (362 rows)',
+            'Quality validation'
+        ],
+        'infrastructure': {
+            'privacy_first': True,
+            'cloud_dependencies': None,
+            'local_processing': True,
+            'max_file_size': '16MB',
+            'concurrent_processing': True
+        }
+    })
+
+
+def js_round(values: np.ndarray) -> np.ndarray:
+    """JavaScript Math.round: halves round towards +infinity."""
+    return np.floor(values + 0.5)
+
+def calculate_capaian(skor: pd.Series, bobot: pd.Series) -> pd.Series:
+    """
+    Vectorized port of the frontend's calculateCapaian, used for indicator rows.
+
+    Positive bobot: Math.round(skor / bobot * 100). Zero bobot counts as fully achieved.
+    Negative bobot (penalty indicators): 0 when nothing happened, down to -100.
+    """
+    skor = skor.astype(float)
+    bobot = bobot.astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        positive = js_round(skor / bobot * 100)
+        negative = -js_round(np.minimum(skor.abs(), bobot.abs()) / bobot.abs() * 100)
+    capaian = np.where(bobot > 0, positive, np.where(bobot < 0, np.where(skor == 0, 0.0, negative), 100.0))
+    return pd.Series(capaian, index=skor.index) + 0.0  # no -0.0
+
+def aspect_capaian(skor: pd.Series, bobot: pd.Series) -> pd.Series:
+    """Capaian of a subtotal/total as the frontend's aspect summary computes it (unrounded, 0 without bobot)."""
+    skor = skor.astype(float)
+    bobot = bobot.astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        capaian = np.where(bobot > 0, skor / bobot * 100, 0.0)
+    return pd.Series(capaian, index=skor.index)
+
+def classify_capaian(skor: pd.Series, bobot: pd.Series) -> pd.Series:
+    """Vectorized port of the frontend's getPenjelasan(skor, bobot)."""
+    skor = skor.astype(float)
+    bobot = bobot.astype(float)
+    capaian = calculate_capaian(skor, bobot)
+    labels = np.select(
+        [
+            (bobot < 0) & (skor == 0),
+            bobot < 0,
+            capaian > 85,
+            capaian >= 76,
+            capaian >= 61,
+            capaian >= 51
+        ],
+        ['Sangat Baik', 'Tidak Baik', 'Sangat Baik', 'Baik', 'Cukup Baik', 'Kurang Baik'],
+        default='Tidak Baik'
+    )
+    return pd.Series(labels, index=skor.index)
+
+def materialize_totals(indicators: pd.DataFrame, client_summary: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Compute per-aspect subtotals and the year total from indicator rows.
+
+    Follows the frontend's generateAspectSummaryFromDetailed exactly, so the
+    stored totals and the ones shown while editing agree: a penalty indicator
+    (negative Bobot) adds its Skor to the subtotal Bobot, and Capaian is the
+    unrounded Skor / Bobot percentage. Aspects the client summarised without any indicator
+    rows (BRIEF assessments) keep the client's values. Returns the subtotal and
+    total rows plus the list of client values that disagree with the computed ones.
+    """
+    numeric = indicators[['Jumlah_Parameter', 'Bobot', 'Skor']].apply(pd.to_numeric, errors='coerce').astype('float64').fillna(0)
+    numeric['Section'] = indicators['Section'].astype(str)
+    numeric['Bobot'] = numeric['Bobot'].where(numeric['Bobot'] >= 0, numeric['Skor'])
+    subtotals = numeric.groupby('Section', sort=False).sum().round(4).reset_index()
+    subtotals['Capaian'] = aspect_capaian(subtotals['Skor'], subtotals['Bobot'])
+    subtotals['Penjelasan'] = classify_capaian(subtotals['Skor'], subtotals['Bobot'])
+
+    validation = []
+    if len(client_summary) > 0:
+        client = client_summary.rename(columns={
+            'aspek': 'Section', 'jumlah_parameter': 'Jumlah_Parameter', 'bobot': 'Bobot',
+            'skor': 'Skor', 'capaian': 'Capaian', 'penjelasan': 'Penjelasan'
+        })
+        for col in ['Jumlah_Parameter', 'Bobot', 'Skor', 'Capaian']:
+            client[col] = pd.to_numeric(client[col], errors='coerce')
+        client['Penjelasan'] = client['Penjelasan'].fillna('').astype(str).str.strip()
+
+        # Compare client-sent subtotals with the computed ones
+        compared = subtotals.merge(client, on='Section', how='inner', suffixes=('', '_client'))
+        for col, tolerance in [('Bobot', 0.01), ('Skor', 0.01), ('Capaian', 0.5)]:
+            mismatch = compared[(compared[col] - compared[f'{col}_client']).abs() > tolerance]
+            validation.extend(
+                {'aspek': section, 'field': col.lower(), 'client': client_value, 'computed': computed_value}
+                for section, client_value, computed_value in zip(mismatch['Section'], mismatch[f'{col}_client'], mismatch[col])
+            )
+
+        # Assessor-written penjelasan wins over the derived classification
+        manual = compared.set_index('Section')['Penjelasan_client']
+        manual = manual[manual != '']
+        subtotals.loc[subtotals['Section'].isin(manual.index), 'Penjelasan'] = subtotals['Section'].map(manual)
+
+        # BRIEF aspects: no indicator rows, keep the client's subtotal as-is
+        brief_only = client[~client['Section'].isin(subtotals['Section'])]
+        if len(brief_only) > 0:
+            subtotals = pd.concat([subtotals, brief_only[subtotals.columns]], ignore_index=True)
+
+    if len(subtotals) == 0:
+        return pd.DataFrame(), validation
+
+    subtotals['Level'] = 3
+    subtotals['Type'] = 'subtotal'
+    subtotals['Deskripsi'] = 'JUMLAH ' + subtotals['Section']
+
+    sections = subtotals['Section'].tolist()
+    total = pd.DataFrame([{
+        'Level': 4,
+        'Type': 'total',
+        'Section': '',
+        'Deskripsi': f"JUMLAH {sections[0]} s.d {sections[-1]}" if len(sections) > 1 else f"JUMLAH {sections[0]}",
+        'Jumlah_Parameter': subtotals['Jumlah_Parameter'].sum(),
+        'Bobot': subtotals['Bobot'].sum(),
+        'Skor': round(subtotals['Skor'].sum(), 4)
+    }])
+    # Weighted achievement: total Skor over total attainable Bobot
+    total['Capaian'] = aspect_capaian(total['Skor'], total['Bobot'])
+    total['Penjelasan'] = classify_capaian(total['Skor'], total['Bobot'])
+
+    return pd.concat([subtotals, total], ignore_index=True), validation
+
+def total_row_summary(row: pd.Series) -> Dict[str, Any]:
+    """JSON-friendly view of a materialized year total row."""
+    def number(value):
+        return round(float(value), SCORE_DECIMALS) if pd.notna(value) else None
+    
+    return {
+        'deskripsi': str(row.get('Deskripsi', '')),
+        'jumlah_parameter': number(row.get('Jumlah_Parameter')),
+        'bobot': number(row.get('Bobot')),
+        'skor': number(row.get('Skor')),
+        'capaian': number(row.get('Capaian')),
+        'penjelasan': str(row.get('Penjelasan')) if pd.notna(row.get('Penjelasan')) else ''
+    }
+
+# Declared in-memory schema of the assessment table (output.xlsx)
+ASSESSMENT_SCHEMA = {
+    'Level': 'Int8',
+    'Type': 'category',
+    'Section': 'category',
+    'No': 'Int16',
+    'Deskripsi': 'object',
+    'Jumlah_Parameter': 'Int16',
+    'Bobot': 'float32',
+    'Skor': 'float32',
+    'Capaian': 'float32',
+    'Penjelasan': 'category',
+    'Tahun': 'int16',
+    'Penilai': 'category',
+    'Jenis_Asesmen': 'category',
+    'Export_Date': 'category'
+}
+ASSESSMENT_COLUMNS = list(ASSESSMENT_SCHEMA)
+SCORE_DECIMALS = 4  # float32 keeps ~7 significant digits; scores are stored rounded to this
+NUMERIC_COLUMNS = ['Jumlah_Parameter', 'Bobot', 'Skor', 'Capaian']
+TYPE_PRIORITY = {'header': 0, 'indicator': 1, 'subtotal': 2, 'total': 3}
+# Excel number formats per column (values are stored unformatted)
+COLUMN_NUMBER_FORMATS = {
+    'Level': '0', 'No': '0.##', 'Jumlah_Parameter': '0', 'Tahun': '0',
+    'Bobot': '#,##0.00', 'Skor': '#,##0.00', 'Capaian': '#,##0.00'
+}
+CHANGE_LOG_MAX_VERSIONS = 100  # versions kept in the change feed before compaction
+CHANGE_LOG_MAX_ROWS = 20000  # row keys kept across all logged versions
+
+def frame_column(frame: pd.DataFrame, name: str, default: Any = '') -> pd.Series:
+    """Column of a client-built frame, or a constant column when the client omitted the key."""
+    return frame[name] if name in frame.columns else pd.Series(default, index=frame.index, dtype=object)
+
+def build_year_rows(data_rows: List[Dict[str, Any]], summary_rows: List[Dict[str, Any]], year: Any,
+                    auditor: str, jenis_asesmen: str, export_date: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Build the incoming year's rows as one DataFrame.
+
+    Indicator Capaian and Penjelasan are recomputed from Skor and Bobot.
+    Returns the XLSX-shaped indicator/header rows and the client's aspect
+    summary rows that survived the empty/default-row filter (used for the
+    aspect headers and for subtotal validation).
+    """
+    incoming = pd.DataFrame(data_rows)
+    row_id = frame_column(incoming, 'id', None).combine_first(frame_column(incoming, 'no', None)).fillna('')
+    is_indicator = row_id.astype(str).str.isdigit()
+    rows = pd.DataFrame({
+        'Level': np.where(is_indicator, 2, 1),
+        'Type': np.where(is_indicator, 'indicator', 'header'),
+        'Section': frame_column(incoming, 'aspek', None).combine_first(frame_column(incoming, 'section', None)).fillna(''),
+        'No': row_id,
+        'Deskripsi': frame_column(incoming, 'deskripsi'),
+        'Jumlah_Parameter': frame_column(incoming, 'jumlah_parameter'),
+        'Bobot': frame_column(incoming, 'bobot'),
+        'Skor': frame_column(incoming, 'skor'),
+        'Capaian': frame_column(incoming, 'capaian'),
+        'Penjelasan': frame_column(incoming, 'penjelasan')
+    }, index=incoming.index)
+
+    # Aspect summary rows: skip empty aspects, meaningless defaults and unedited roman numeral rows
+    summary = pd.DataFrame(summary_rows, columns=[
+        'aspek', 'deskripsi', 'jumlah_parameter', 'bobot', 'skor', 'capaian', 'penjelasan'
+    ])
+    section = summary['aspek'].fillna('').astype(str)
+    deskripsi = summary['deskripsi'].fillna('').astype(str)
+    empty_scores = (pd.to_numeric(summary['bobot'], errors='coerce').fillna(0) == 0) & \
+                   (pd.to_numeric(summary['skor'], errors='coerce').fillna(0) == 0)
+    unedited = section.isin(['I', 'II', 'III', 'IV', 'V', 'VI']) & (deskripsi.str.strip() == '')
+    summary = summary[(section != '') & (deskripsi != '') & ~empty_scores & ~unedited]
+
+    headers = pd.DataFrame({
+        'Level': 1,
+        'Type': 'header',
+        'Section': summary['aspek'],
+        'No': '',
+        'Deskripsi': summary['deskripsi']
+    })
+
+    year_rows = pd.concat([rows, headers], ignore_index=True)
+    year_rows[NUMERIC_COLUMNS] = year_rows[NUMERIC_COLUMNS].apply(pd.to_numeric, errors='coerce')
+
+    # Indicator Capaian/Penjelasan are derived like /api/assessment/patch does, never taken from the client
+    indicator = year_rows['Type'] == 'indicator'
+    skor = year_rows.loc[indicator, 'Skor'].fillna(0)
+    bobot = year_rows.loc[indicator, 'Bobot'].fillna(0)
+    year_rows.loc[indicator, 'Capaian'] = calculate_capaian(skor, bobot)
+    year_rows.loc[indicator, 'Penjelasan'] = classify_capaian(skor, bobot)
+    year_rows = year_rows.assign(Tahun=year, Penilai=auditor, Jenis_Asesmen=jenis_asesmen, Export_Date=export_date)
+    return year_rows.reindex(columns=ASSESSMENT_COLUMNS), summary
+
+def sort_assessment_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sort rows year → aspek → type → no, with each year's total last.
+
+    All keys are precomputed columns (categorical section codes, numeric type
+    priority and No) combined with one stable lexsort, no per-row Python calls.
+    """
+    year_key = pd.to_numeric(df['Tahun'], errors='coerce').to_numpy()
+    total_key = df['Type'].eq('total').to_numpy()
+    section_key = pd.Categorical(df['Section'].astype(object).fillna('').astype(str)).codes
+    type_key = df['Type'].astype(object).map(TYPE_PRIORITY).fillna(1).to_numpy()
+    no_key = pd.to_numeric(df['No'], errors='coerce').fillna(9999).to_numpy()
+    order = np.lexsort((no_key, type_key, section_key, total_key, year_key))
+    return df.iloc[order]
+
+# Serializes read-modify-write cycles on output.xlsx and its version counter
+dataset_lock = threading.Lock()
+
+def read_dataset_meta() -> Dict[str, Any]:
+    """Dataset metadata: version, last update and the change log."""
+    try:
+        return json.loads(DATASET_META_PATH.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def read_dataset_version() -> int:
+    """Current dataset version (bumped on every save/patch; 0 before the first one)."""
+    return int(read_dataset_meta().get('version', 0))
+
+def write_dataset_meta(meta: Dict[str, Any]):
+    """Atomically replace the dataset metadata file."""
+    meta_tmp = DATASET_META_PATH.with_suffix('.tmp')
+    meta_tmp.write_text(json.dumps(meta))
+    os.replace(meta_tmp, DATASET_META_PATH)
+
+def next_dataset_version(meta: Dict[str, Any]) -> int:
+    """Version for the next save; numbers of abandoned (rolled back) versions are never reused."""
+    abandoned = [last for _, last in meta.get('abandoned_versions', [])]
+    return max([int(meta.get('version', 0)), *abandoned]) + 1
+
+def row_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    Stable row identity for the change feed: 'Tahun|Type|Section|No'.
+
+    Rows without a numeric No (headers, client summary rows) are told apart by
+    their position within the same Tahun/Type/Section: the first keeps the plain
+    key, later ones get '#2', '#3', ...
+    """
+    keys = (
+        df['Tahun'].astype(str) + '|' + text_column(df['Type']) + '|'
+        + text_column(df['Section']) + '|' + no_text(df['No'])
+    )
+    unnumbered = df['No'].isna()
+    if unnumbered.any():
+        position = keys[unnumbered].groupby(keys[unnumbered], sort=False).cumcount() + 1
+        later = position[position > 1]
+        keys.loc[later.index] = keys.loc[later.index] + '#' + later.astype(str)
+    return keys
+
+def row_fingerprints(df: pd.DataFrame) -> pd.Series:
+    """Hash of every stored value per row, indexed by row key (last duplicate wins)."""
+    hashes = pd.util.hash_pandas_object(storage_frame(df).astype(object).astype(str), index=False)
+    hashes.index = row_keys(df).values
+    return hashes[~hashes.index.duplicated(keep='last')]
+
+def diff_assessment_rows(previous: pd.DataFrame, current: pd.DataFrame) -> Dict[str, Any]:
+    """Row keys upserted and deleted between two versions of the dataset, with the years touched."""
+    before = row_fingerprints(previous)
+    after = row_fingerprints(current)
+    common = after.index.intersection(before.index)
+    changed = common[after[common].values != before[common].values]
+    upserted = sorted(after.index.difference(before.index).union(changed))
+    deleted = sorted(before.index.difference(after.index))
+    years = sorted({int(key.split('|', 1)[0]) for key in upserted + deleted})
+    return {'years': years, 'upserted': upserted, 'deleted': deleted}
+
+def compact_change_log(meta: Dict[str, Any]):
+    """Drop the oldest change log entries beyond the size limits."""
+    changes = meta['changes']
+    while changes and (
+        len(changes) > CHANGE_LOG_MAX_VERSIONS
+        or sum(len(entry['upserted']) + len(entry['deleted']) for entry in changes) > CHANGE_LOG_MAX_ROWS
+    ):
+        meta['compacted_through'] = changes.pop(0)['version']
+    if 'abandoned_versions' in meta:
+        meta['abandoned_versions'] = [
+            [first, last] for first, last in meta['abandoned_versions']
+            if last >= meta.get('compacted_through', 0)
+        ]
+
+def dataset_changes_since(since: int) -> Optional[Dict[str, Any]]:
+    """
+    Net changes after version `since`: upserted row keys, tombstones and years.
+
+    Returns None when the client must do a full resync: the versions it is
+    missing were compacted away, or it is ahead of the server (dataset reset).
+    """
+    meta = read_dataset_meta()
+    version = int(meta.get('version', 0))
+    # Datasets saved before the change feed existed have no history
+    compacted_through = int(meta.get('compacted_through', version if 'changes' not in meta else 0))
+    if since > version or since < compacted_through:
+        return None
+    # Clients that saw versions lost in a failed background write hold rows that no longer exist
+    if any(first <= since <= last for first, last in meta.get('abandoned_versions', [])):
+        return None
+    
+    upserted, deleted, years = set(), set(), set()
+    for entry in meta.get('changes', []):
+        if entry['version'] <= since:
+            continue
+        years.update(entry['years'])
+        upserted.update(entry['upserted'])
+        upserted.difference_update(entry['deleted'])
+        deleted.difference_update(entry['upserted'])
+        deleted.update(entry['deleted'])
+    return {'version': version, 'years': sorted(years), 'upserted': upserted, 'deleted': sorted(deleted)}
+
+def enforce_assessment_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast an assessment table to ASSESSMENT_SCHEMA.
+
+    Empty strings become missing values. Rows without a year are dropped.
+    Integer columns holding fractional values (legacy No like 1.1) fall back
+    to float32 with a warning. Columns outside the schema (legacy
+    Jenis_Penilaian) are kept as categoricals.
+    """
+    extra = [col for col in df.columns if col not in ASSESSMENT_SCHEMA]
+    typed = df.reindex(columns=ASSESSMENT_COLUMNS + extra)
+    
+    tahun = pd.to_numeric(typed['Tahun'], errors='coerce')
+    if tahun.isna().any():
+        print(f"⚠️ Dropping {int(tahun.isna().sum())} row(s) without a valid Tahun")
+        typed = typed[tahun.notna()]
+    
+    columns = {}
+    for col in typed.columns:
+        dtype = ASSESSMENT_SCHEMA.get(col, 'category')
+        values = typed[col]
+        if dtype in ('category', 'object'):
+            values = values.astype(object)
+            values = values.where(values.notna() & (values.astype(str).str.strip() != ''), None)
+            columns[col] = values.astype(dtype)
+            continue
+        
+        numeric = pd.to_numeric(values, errors='coerce')
+        if dtype in ('Int8', 'Int16') and (numeric.dropna() % 1 != 0).any():
+            print(f"⚠️ Column {col} has fractional values, keeping it as float32")
+            dtype = 'float32'
+        elif dtype.startswith(('Int', 'int')):
+            numeric = numeric.round()
+        columns[col] = numeric.astype(dtype)
+    return pd.DataFrame(columns, index=typed.index).reset_index(drop=True)
+
+def storage_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Widen float32 columns (rounded to SCORE_DECIMALS) so the workbook gets clean decimals."""
+    widened = {
+        col: df[col].astype('float64').round(SCORE_DECIMALS)
+        for col in df.columns if df[col].dtype == 'float32'
+    }
+    return df.assign(**widened)
+
+def json_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Serialize a typed frame to JSON-safe records in one columnar pass.
+
+    float32 columns are widened and rounded back to the stored precision,
+    categoricals become plain strings and missing values become None.
+    """
+    columns = {}
+    for col in frame.columns:
+        values = frame[col]
+        if pd.api.types.is_float_dtype(values):
+            values = values.astype('float64').round(SCORE_DECIMALS)
+        values = values.astype(object)
+        columns[col] = values.where(values.notna(), None)
+    return pd.DataFrame(columns, index=frame.index).to_dict('records')
+
+def workbook_rows(df: pd.DataFrame):
+    """Rows of plain Python values (missing values as None), built column-wise."""
+    columns = [df[col].astype(object).where(df[col].notna(), None).tolist() for col in df.columns]
+    return zip(*columns)
+
+def write_xlsxwriter(df: pd.DataFrame, path: Path, number_formats: Dict[str, str]):
+    workbook = xlsxwriter.Workbook(str(path), {'constant_memory': True, 'nan_inf_to_errors': True})
+    try:
+        sheet = workbook.add_worksheet('Sheet1')
+        bold = workbook.add_format({'bold': True})
+        for col_index, col in enumerate(df.columns):
+            if col in number_formats:
+                sheet.set_column(col_index, col_index, None, workbook.add_format({'num_format': number_formats[col]}))
+        sheet.write_row(0, 0, [str(col) for col in df.columns], bold)
+        for row_index, row in enumerate(workbook_rows(df), start=1):
+            sheet.write_row(row_index, 0, row)
+    finally:
+        workbook.close()
+
+def write_openpyxl(df: pd.DataFrame, path: Path, number_formats: Dict[str, str]):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    header = []
+    for col in df.columns:
+        cell = WriteOnlyCell(sheet, value=str(col))
+        cell.font = Font(bold=True)
+        header.append(cell)
+    sheet.append(header)
+    
+    formatted = [(index, number_formats[col]) for index, col in enumerate(df.columns) if col in number_formats]
+    for row in workbook_rows(df):
+        row = list(row)
+        for index, number_format in formatted:
+            if row[index] is not None:
+                cell = WriteOnlyCell(sheet, value=row[index])
+                cell.number_format = number_format
+                row[index] = cell
+        sheet.append(row)
+    workbook.save(str(path))
+
+def write_workbook(df: pd.DataFrame, path: Path, number_formats: Optional[Dict[str, str]] = None):
+    """
+    Write a frame to an .xlsx file in streaming (constant-memory) mode.
+
+    Uses xlsxwriter when installed, otherwise openpyxl's write-only mode.
+    The workbook is written to a temporary file and moved into place, so
+    readers never see a half-written file.
+    """
+    number_formats = COLUMN_NUMBER_FORMATS if number_formats is None else number_formats
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.stem}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        if xlsxwriter is not None:
+            write_xlsxwriter(df, tmp_path, number_formats)
+        else:
+            write_openpyxl(df, tmp_path, number_formats)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+class WorkbookWriteBehind:
+    """
+    Background workbook writer.
+
+    Only the latest frame submitted for a path is written: saves arriving
+    while a write is in flight coalesce into one follow-up write. on_written
+    receives the file's new mtime_ns, on_failed the exception; both run on the
+    writer thread while the path still counts as pending. Pending writes are
+    flushed at interpreter exit.
+    """
+    
+    def __init__(self):
+        self.pending: Dict[Path, Tuple[pd.DataFrame, Optional[Callable], Optional[Callable]]] = {}
+        self.writing: Optional[Path] = None
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+    
+    def submit(self, df: pd.DataFrame, path: Path, on_written: Optional[Callable[[int], None]] = None,
+               on_failed: Optional[Callable[[Exception], None]] = None):
+        with self.condition:
+            self.pending[path] = (df, on_written, on_failed)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+    
+    def discard(self, path: Path):
+        """Drop a submitted write that has not started yet."""
+        with self.condition:
+            self.pending.pop(path, None)
+            self.condition.notify_all()
+    
+    def is_pending(self, path: Path) -> bool:
+        with self.condition:
+            return path in self.pending or self.writing == path
+    
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                path, (df, on_written, on_failed) = self.pending.popitem()
+                self.writing = path
+            try:
+                write_workbook(df, path)
+                if on_written is not None:
+                    on_written(path.stat().st_mtime_ns)
+            except Exception as e:
+                print(f"❌ Background write of {path.name} failed: {e}")
+                if on_failed is not None:
+                    try:
+                        on_failed(e)
+                    except Exception as rollback_error:
+                        print(f"❌ Could not roll back after failed write of {path.name}: {rollback_error}")
+            finally:
+                with self.condition:
+                    self.writing = None
+                    self.condition.notify_all()
+    
+    def flush(self):
+        """Block until every submitted workbook is on disk."""
+        with self.condition:
+            while self.pending or self.writing is not None:
+                self.condition.wait()
+
+workbook_write_behind = WorkbookWriteBehind()
+atexit.register(workbook_write_behind.flush)
+
+# Write-behind bookkeeping: the last version whose workbook is on disk (None: all saves
+# are), the last failed background write and whether a save response reported it yet
+write_behind_state: Dict[str, Any] = {'durable_version': None, 'failure': None, 'unreported': False}
+
+def take_write_failure() -> Optional[Dict[str, Any]]:
+    """The last failed background write, once: for the next save response to report."""
+    if not write_behind_state['unreported']:
+        return None
+    write_behind_state['unreported'] = False
+    return write_behind_state['failure']
+
+# Typed, resident copy of output.xlsx; refreshed when the file changes on disk
+assessment_cache = {'mtime_ns': None, 'df': None}
+
+def load_assessment_df() -> pd.DataFrame:
+    """
+    Typed assessment table (ASSESSMENT_SCHEMA), or an empty one if nothing was saved yet.
+
+    The frame is shared between requests: callers must not modify it in place.
+    """
+    # A background write is still pending: the cached frame is newer than the file
+    if assessment_cache['df'] is not None and workbook_write_behind.is_pending(OUTPUT_XLSX_PATH):
+        return assessment_cache['df']
+    if not OUTPUT_XLSX_PATH.exists():
+        return enforce_assessment_schema(pd.DataFrame(columns=ASSESSMENT_COLUMNS))
+    mtime_ns = OUTPUT_XLSX_PATH.stat().st_mtime_ns
+    if assessment_cache['mtime_ns'] != mtime_ns:
+        assessment_cache['df'] = enforce_assessment_schema(pd.read_excel(OUTPUT_XLSX_PATH))
+        assessment_cache['mtime_ns'] = mtime_ns
+    return assessment_cache['df']
+
+def read_snapshot_manifest() -> Dict[str, Any]:
+    """Snapshot manifest: {'years': {year: [{version, at, rows, file}, ...]}} with versions ascending."""
+    try:
+        return json.loads((SNAPSHOT_FOLDER / 'manifest.json').read_text())
+    except (FileNotFoundError, ValueError):
+        return {'years': {}}
+
+def write_year_segment(manifest: Dict[str, Any], year: int, version: int, rows: pd.DataFrame):
+    """Write one immutable segment holding a year's rows as of `version`."""
+    suffix = '.msgpack' if msgpack is not None else '.json'
+    relative = Path(str(year)) / f"v{version}{suffix}"
+    (SNAPSHOT_FOLDER / relative).parent.mkdir(parents=True, exist_ok=True)
+    write_packed(SNAPSHOT_FOLDER / relative, table_payload(storage_frame(rows)))
+    
+    segments = manifest['years'].setdefault(str(year), [])
+    # A save that failed after writing its segment is retried with the same version
+    segments[:] = [segment for segment in segments if segment['version'] != version]
+    segments.append({'version': version, 'at': datetime.now().isoformat(), 'rows': int(len(rows)), 'file': relative.as_posix()})
+
+def write_year_snapshots(previous: pd.DataFrame, current: pd.DataFrame, years: List[int], version: int):
+    """
+    Copy-on-write snapshots: store only the changed years' rows as new segments.
+
+    The first time a year changes, its rows before the save are kept as a base
+    segment at the previous version, so every save can be rolled back.
+    """
+    if not years:
+        return
+    manifest = read_snapshot_manifest()
+    for year in years:
+        if str(year) not in manifest['years']:
+            before = previous[previous['Tahun'] == year]
+            if len(before) > 0:
+                write_year_segment(manifest, year, version - 1, before)
+        write_year_segment(manifest, year, version, current[current['Tahun'] == year])
+    
+    SNAPSHOT_FOLDER.mkdir(parents=True, exist_ok=True)
+    manifest_tmp = SNAPSHOT_FOLDER / 'manifest.json.tmp'
+    manifest_tmp.write_text(json.dumps(manifest))
+    os.replace(manifest_tmp, SNAPSHOT_FOLDER / 'manifest.json')
+
+def load_year_snapshot(year: int, version: int) -> Optional[Tuple[int, pd.DataFrame]]:
+    """A year's typed rows as of `version` (segment version, rows), or None without a snapshot."""
+    segments = [
+        segment for segment in read_snapshot_manifest()['years'].get(str(year), [])
+        if segment['version'] <= version
+    ]
+    if not segments:
+        return None
+    segment = segments[-1]
+    table = read_packed(SNAPSHOT_FOLDER / segment['file'])
+    rows = pd.DataFrame(table['rows'], columns=table['columns'])
+    return segment['version'], enforce_assessment_schema(rows)
+
+def store_assessment_df(df: pd.DataFrame) -> int:
+    """
+    Enforce the schema, write output.xlsx and bump the dataset version.
+
+    The rows that changed against the previous version are appended to the
+    change log in the metadata file, and the changed years are snapshotted.
+    Must be called with dataset_lock held. Returns the new version.
+    """
+    typed = enforce_assessment_schema(df)
+    previous = load_assessment_df()
+    change = diff_assessment_rows(previous, typed)
+    meta = read_dataset_meta()
+    version = next_dataset_version(meta)
+    write_year_snapshots(previous, typed, change['years'], version)
+    
+    os.makedirs(OUTPUT_XLSX_PATH.parent, exist_ok=True)
+    assessment_cache['df'] = typed
+    if app.config['WORKBOOK_WRITE_BEHIND']:
+        if write_behind_state['durable_version'] is None:
+            write_behind_state['durable_version'] = int(meta.get('version', 0))
+        assessment_cache['mtime_ns'] = None
+        
+        def on_written(mtime_ns: int):
+            with dataset_lock:
+                # Keep serving the resident frame once the file catches up with it
+                if assessment_cache['df'] is typed:
+                    assessment_cache['mtime_ns'] = mtime_ns
+                    write_behind_state['durable_version'] = None
+                elif write_behind_state['durable_version'] is not None:
+                    write_behind_state['durable_version'] = max(write_behind_state['durable_version'], version)
+        
+        workbook_write_behind.submit(storage_frame(typed), OUTPUT_XLSX_PATH, on_written, rollback_failed_write)
+    else:
+        write_workbook(storage_frame(typed), OUTPUT_XLSX_PATH)
+        assessment_cache['mtime_ns'] = OUTPUT_XLSX_PATH.stat().st_mtime_ns
+    
+    if 'changes' not in meta:
+        meta['changes'] = []
+        meta['compacted_through'] = version - 1
+    meta['changes'].append({'version': version, 'at': datetime.now().isoformat(), **change})
+    compact_change_log(meta)
+    meta.update(version=version, updated_at=datetime.now().isoformat())
+    write_dataset_meta(meta)
+    
+    search_index.refresh_years(previous, typed, change['years'])
+    timeseries_index.refresh_years(previous, typed, change['years'])
+    return version
+
+def drop_snapshots_after(version: int):
+    """Remove snapshot segments newer than `version` (saves that never reached the workbook)."""
+    manifest = read_snapshot_manifest()
+    for year, segments in list(manifest['years'].items()):
+        for segment in segments:
+            if segment['version'] > version:
+                (SNAPSHOT_FOLDER / segment['file']).unlink(missing_ok=True)
+        kept = [segment for segment in segments if segment['version'] <= version]
+        if kept:
+            manifest['years'][year] = kept
+        else:
+            del manifest['years'][year]
+    if SNAPSHOT_FOLDER.exists():
+        manifest_tmp = SNAPSHOT_FOLDER / 'manifest.json.tmp'
+        manifest_tmp.write_text(json.dumps(manifest))
+        os.replace(manifest_tmp, SNAPSHOT_FOLDER / 'manifest.json')
+
+def rollback_failed_write(error: Exception):
+    """
+    Undo the saves a failed background write would have persisted.
+
+    output.xlsx still holds the last durable version: the metadata, change log
+    and snapshots go back to it, the resident frame is dropped so the next
+    read reloads the file, and the lost versions are recorded so clients that
+    saw them resync and their numbers are not reused.
+    """
+    with dataset_lock:
+        workbook_write_behind.discard(OUTPUT_XLSX_PATH)
+        durable = write_behind_state['durable_version']
+        meta = read_dataset_meta()
+        latest = int(meta.get('version', 0))
+        if durable is None or durable >= latest:
+            return
+        
+        meta['changes'] = [entry for entry in meta.get('changes', []) if entry['version'] <= durable]
+        meta.setdefault('abandoned_versions', []).append([durable + 1, latest])
+        meta.update(version=durable, updated_at=datetime.now().isoformat())
+        write_dataset_meta(meta)
+        drop_snapshots_after(durable)
+        
+        assessment_cache.update(df=None, mtime_ns=None)
+        write_behind_state.update(
+            durable_version=None,
+            unreported=True,
+            failure={
+                'error': str(error),
+                'at': datetime.now().isoformat(),
+                'restored_version': durable,
+                'lost_versions': list(range(durable + 1, latest + 1))
+            }
+        )
+        print(f"⚠️ Rolled back to version {durable}; versions {durable + 1}-{latest} were not written")
+
+INDONESIAN_STOPWORDS = frozenset("""
+    yang dan di ke dari untuk dengan pada dalam atau ini itu adalah oleh sebagai telah
+    akan juga serta bagi secara tersebut agar dapat harus sudah antara setiap para
+    karena maupun namun bahwa hal suatu sesuai terhadap melalui yaitu
+""".split())
+
+# (prefix, initials to try when the prefix is followed by a vowel) in matching order;
+# a nasal prefix replaces the root's initial (menilai -> nilai, menetapkan -> tetap,
+# pengendalian -> kendali, memantau -> pantau) or keeps a vowel root (mengawasi -> awas);
+# menge-/penge- precede one-syllable roots (pengesahan -> sah)
+INDONESIAN_PREFIXES = [
+    ('meny', ('s',)), ('meng', ('', 'k')), ('menge', ('',)), ('mem', ('p', 'm', '')), ('men', ('t', 'n', '')), ('me', ('',)),
+    ('peny', ('s',)), ('peng', ('', 'k')), ('penge', ('',)), ('pem', ('p', 'm', '')), ('pen', ('t', 'n', '')),
+    ('pel', ('',)), ('per', ('',)), ('pe', ('',)),
+    ('ber', ('',)), ('bel', ('',)), ('ter', ('',)), ('di', ('',)), ('ke', ('',)), ('se', ('',))
+]
+
+# Roots of the GCG assessment vocabulary. Stemming stops at a root, and among the
+# ambiguous nasal restorations the one that is a root wins.
+INDONESIAN_ROOTS = frozenset("""
+    nilai kendali bijak kelola awas usaha direksi komisaris dewan laksana laku milik modal
+    undang informasi atur lanjut lapor tentu tugas efektif selenggara terap pegang saham beri
+    kinerja prinsip rapat anggar dasar tahun uang implementasi rencana bidang praktik komitmen
+    ungkap transparansi aspek perilaku negara angkat henti putus jangka setuju wewenang tanggung
+    latih ajar bagi faktor dukung peran anggota potensi bentur pasti hadir sekretaris sekretariat
+    fungsi waktu kualitas sedia standar sistem ukur koordinasi administrasi kaya gratifikasi duga
+    simpang sangkut perlu jaga panjang pendek masuk sah ambil proses buka jawab tetap butuh sampai
+    rancang arah patung calon usul timbang tindak diri pantau komite susun penuh target
+    operasional urus hubung tambah monitor manajemen komunikasi intern akses relevan andal kala
+    penting harga contoh badan tingkat patuh regulasi efektivitas struktur organisasi kembang
+    kuasa kena kait pedoman kepada jadi indonesia jelas konsisten individu kolegial insentif
+    tantiem internal cukup tujuh delapan sembilan total risiko audit etika evaluasi kompetensi
+    remunerasi independen direktur peraturan pada tanggungjawab
+""".split())
+
+VOWELS = frozenset('aeiou')
+
+def indonesian_suffix_forms(word: str) -> List[str]:
+    """The word with particle, possessive and derivational suffixes removed, most stripped first."""
+    forms = [word]
+    for suffixes in (('lah', 'kah', 'tah', 'pun'), ('nya', 'ku', 'mu')):
+        for suffix in suffixes:
+            if forms[-1].endswith(suffix) and len(forms[-1]) - len(suffix) >= 4:
+                forms.append(forms[-1][:-len(suffix)])
+                break
+    base = forms[-1]
+    derived, loanword = [], []
+    for suffix in ('kan', 'an', 'i'):
+        stripped = base[:-len(suffix)]
+        if base.endswith(suffix) and len(stripped) >= 4:
+            # -si usually ends a loanword (informasi, direksi): only read it as -i after the word itself
+            (loanword if suffix == 'i' and stripped.endswith('s') else derived).append(stripped)
+    return derived + forms[::-1] + loanword
+
+def indonesian_prefix_forms(word: str, depth: int = 0) -> List[str]:
+    """The word followed by every reading with up to three prefixes removed, preferred readings first."""
+    forms = [word]
+    if depth == 3 or word in INDONESIAN_ROOTS:
+        return forms
+    for prefix, initials in INDONESIAN_PREFIXES:
+        rest = word[len(prefix):]
+        if not word.startswith(prefix) or len(rest) < 3:
+            continue
+        for initial in (initials if rest[0] in VOWELS else ('',)):
+            # Short readings only count as known roots (disahkan -> sah, memadai -> pada)
+            if len(initial + rest) >= 4 or initial + rest in INDONESIAN_ROOTS:
+                forms.extend(indonesian_prefix_forms(initial + rest, depth + 1))
+    return forms
+
+@functools.lru_cache(maxsize=65536)
+def stem_indonesian(word: str) -> str:
+    """
+    Indonesian stemmer: Sastrawi's dictionary-backed one when installed.
+
+    Otherwise rule-based in Nazief-Adriani order (suffixes, then up to three
+    prefixes) against INDONESIAN_ROOTS: the first reading that is a known root
+    wins, so penilaian, menilai and nilai all become nilai. Words without a
+    known root get the most stripped reading with the preferred restorations.
+    """
+    if len(word) <= 4 or not word.isalpha() or word in INDONESIAN_ROOTS:
+        return word
+    if sastrawi_stemmer is not None:
+        return sastrawi_stemmer.stem(word) or word
+    readings = [reading for form in indonesian_suffix_forms(word) for reading in indonesian_prefix_forms(form)]
+    for reading in readings:
+        if reading in INDONESIAN_ROOTS:
+            return reading
+    # No known root: follow the preferred reading (first prefix and initial) to the end
+    stem = indonesian_suffix_forms(word)[0]
+    for _ in range(3):
+        prefix_forms = indonesian_prefix_forms(stem, 2)
+        if len(prefix_forms) == 1:
+            break
+        stem = prefix_forms[1]
+    return stem
+
+def search_terms(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, stemmed."""
+    return [
+        stem_indonesian(token)
+        for token in re.findall(r'[a-z0-9]+', text.lower())
+        if token not in INDONESIAN_STOPWORDS and len(token) > 1
+    ]
+
+class YearPartitionedIndex(ABC):
+    """
+    Base for secondary indexes over the assessment table, partitioned by year.
+
+    The index tracks the assessment frame it was built from: saves refresh
+    only the years they changed, and any other change of the resident frame
+    triggers a full rebuild on the next lookup. Subclasses implement
+    _reset, _add_rows and _remove_year and hold self.lock while reading.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source: Optional[pd.DataFrame] = None
+        self._reset()
+    
+    @abstractmethod
+    def _reset(self):
+        """Empty the index."""
+    
+    @abstractmethod
+    def _add_rows(self, df: pd.DataFrame):
+        """Index the given rows."""
+    
+    @abstractmethod
+    def _remove_year(self, year: int):
+        """Forget every row of one year."""
+    
+    def _ensure(self, df: pd.DataFrame):
+        """Rebuild from df unless the index was built from (or refreshed to) it. Lock must be held."""
+        if self.source is not df:
+            self._reset()
+            self._add_rows(df)
+            self.source = df
+    
+    def refresh_years(self, previous: pd.DataFrame, current: pd.DataFrame, years: List[int]):
+        """Re-index the changed years after a save (no-op until the index is first built)."""
+        with self.lock:
+            if self.source is not previous:
+                return
+            for year in years:
+                self._remove_year(year)
+                self._add_rows(current[current['Tahun'] == year])
+            self.source = current
+
+class AssessmentSearchIndex(YearPartitionedIndex):
+    """
+    BM25-ranked inverted index over Deskripsi and Penjelasan of saved rows.
+
+    Header and indicator rows are indexed (materialized subtotal/total rows
+    carry no text of their own).
+    """
+    
+    K1 = 1.5
+    B = 0.75
+    
+    def _reset(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.year_keys: Dict[int, List[str]] = {}
+        self.total_length = 0
+    
+    def _add_rows(self, df: pd.DataFrame):
+        rows = df[df['Type'].astype(object).isin(['header', 'indicator'])]
+        for key, year, row_type, section, no, deskripsi, penjelasan in zip(
+            row_keys(rows), rows['Tahun'], text_column(rows['Type']), text_column(rows['Section']),
+            no_text(rows['No']), text_column(rows['Deskripsi']), text_column(rows['Penjelasan'])
+        ):
+            terms = search_terms(deskripsi) + search_terms(penjelasan)
+            if key in self.documents or not terms:
+                continue
+            for term in terms:
+                postings = self.postings.setdefault(term, {})
+                postings[key] = postings.get(key, 0) + 1
+            self.documents[key] = {
+                'row_key': key, 'tahun': int(year), 'type': row_type, 'section': section,
+                'no': no, 'deskripsi': deskripsi, 'penjelasan': penjelasan, 'length': len(terms)
+            }
+            self.year_keys.setdefault(int(year), []).append(key)
+            self.total_length += len(terms)
+    
+    def _remove_year(self, year: int):
+        for key in self.year_keys.pop(year, []):
+            document = self.documents.pop(key)
+            self.total_length -= document['length']
+            for term in set(search_terms(document['deskripsi']) + search_terms(document['penjelasan'])):
+                postings = self.postings[term]
+                postings.pop(key, None)
+                if not postings:
+                    del self.postings[term]
+    
+    def search(self, df: pd.DataFrame, query: str, year: Optional[int] = None,
+               section: Optional[str] = None, limit: int = 20) -> Tuple[List[str], int, List[Dict[str, Any]]]:
+        """Query terms, number of matching rows and the top `limit` rows by BM25 score."""
+        terms = list(dict.fromkeys(search_terms(query)))
+        with self.lock:
+            self._ensure(df)
+            if not self.documents or not terms:
+                return terms, 0, []
+            
+            average_length = self.total_length / len(self.documents)
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self.postings.get(term, {})
+                idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    document = self.documents[key]
+                    if (year is not None and document['tahun'] != year) or (section and document['section'] != section):
+                        continue
+                    norm = self.K1 * (1 - self.B + self.B * document['length'] / average_length)
+                    scores[key] = scores.get(key, 0.0) + idf * frequency * (self.K1 + 1) / (frequency + norm)
+            
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], self.documents[item[0]]['tahun']))
+            results = [
+                {**{field: value for field, value in self.documents[key].items() if field != 'length'}, 'score': round(score, 4)}
+                for key, score in top
+            ]
+        return terms, len(scores), results
+
+search_index = AssessmentSearchIndex()
+
+class IndicatorSeriesIndex(YearPartitionedIndex):
+    """
+    Per-indicator time series keyed on (Type, Section, No).
+
+    Indicators are keyed by Section and No, aspect subtotals by Section and
+    the year total by ('total', '', ''), so one series is read without
+    touching any other row.
+    """
+    
+    def _reset(self):
+        self.series: Dict[Tuple[str, str, str], Dict[int, Dict[str, Any]]] = {}
+        self.year_keys: Dict[int, set] = {}
+    
+    def _add_rows(self, df: pd.DataFrame):
+        rows = df[df['Type'].astype(object).isin(['indicator', 'subtotal', 'total'])]
+        types = text_column(rows['Type'])
+        records = json_records(pd.DataFrame({
+            'type': types,
+            'section': text_column(rows['Section']).where(types != 'total', ''),
+            'no': no_text(rows['No']).where(rows['Type'] == 'indicator', ''),
+            'year': rows['Tahun'],
+            'deskripsi': text_column(rows['Deskripsi']),
+            'jumlah_parameter': rows['Jumlah_Parameter'].astype('float64'),
+            'bobot': rows['Bobot'],
+            'skor': rows['Skor'],
+            'capaian': rows['Capaian'],
+            'penjelasan': text_column(rows['Penjelasan'])
+        }))
+        for record in records:
+            key = (record.pop('type'), record.pop('section'), record.pop('no'))
+            year = int(record['year'])
+            self.series.setdefault(key, {})[year] = record
+            self.year_keys.setdefault(year, set()).add(key)
+    
+    def _remove_year(self, year: int):
+        for key in self.year_keys.pop(year, set()):
+            points = self.series[key]
+            points.pop(year, None)
+            if not points:
+                del self.series[key]
+    
+    def lookup(self, df: pd.DataFrame, keys: List[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], List[Dict[str, Any]]]:
+        """Points (sorted by year) of each requested series; unknown keys get an empty list."""
+        with self.lock:
+            self._ensure(df)
+            return {key: [dict(point) for _, point in sorted(self.series.get(key, {}).items())] for key in keys}
+
+timeseries_index = IndicatorSeriesIndex()
+
+def parse_series_key(text: str) -> Tuple[str, str, str]:
+    """'III:18' -> indicator III.18, 'III' -> subtotal of aspect III, 'total' -> year total."""
+    text = text.strip()
+    if text.lower() == 'total':
+        return ('total', '', '')
+    if ':' in text:
+        section, no = text.split(':', 1)
+        number = pd.to_numeric(no.strip(), errors='coerce')
+        if pd.isna(number):
+            raise ValueError(f'Invalid indicator number in {text!r}')
+        return ('indicator', section.strip(), no_text(pd.Series([number], dtype='float64')).iloc[0])
+    if not text:
+        raise ValueError('Empty series key')
+    return ('subtotal', text, '')
+
+def rolling_statistics(points: List[Dict[str, Any]], window: int) -> List[Dict[str, Any]]:
+    """Add year-over-year change and rolling mean/min/max/std of Skor and Capaian."""
+    if not points:
+        return points
+    frame = pd.DataFrame(points)[['skor', 'capaian']].astype('float64')
+    rolling = frame.rolling(window, min_periods=1)
+    stats = pd.concat({
+        'change': frame.diff(),
+        'rolling_mean': rolling.mean(),
+        'rolling_min': rolling.min(),
+        'rolling_max': rolling.max(),
+        'rolling_std': rolling.std()
+    }, axis=1)
+    stats.columns = [f"{name}_{column}" for name, column in stats.columns]
+    for point, extra in zip(points, json_records(stats.round(SCORE_DECIMALS))):
+        point.update(extra)
+    return points
+
+def merge_year(existing_df: pd.DataFrame, year_df: pd.DataFrame, year: Any) -> pd.DataFrame:
+    """Replace one year's rows in the dataset (including deletions), dedupe and sort."""
+    if year:
+        existing_df = existing_df[existing_df['Tahun'] != year]
+    combined = pd.concat([existing_df, year_df], ignore_index=True)
+    combined_unique = combined.drop_duplicates(subset=['Tahun', 'Section', 'No', 'Deskripsi'], keep='last')
+    if len(combined) != len(combined_unique):
+        print(f"🔧 DEBUG: Removed {len(combined) - len(combined_unique)} duplicate rows")
+    return sort_assessment_rows(combined_unique)
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """Recently captured request profiles (admin only)."""
+    if not is_profile_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    with profiles_lock:
+        summaries = [
+            {key: value for key, value in profile.items() if key not in ('stacks', 'processor_profiles')}
+            for profile in reversed(stored_profiles.values())
+        ]
+    return jsonify({'success': True, 'profiles': summaries})
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    One captured profile (admin only).
+    
+    ?format=folded returns the request's folded stacks as plain text for
+    flame graph tools; ?format=folded&processor=N returns processor profile N.
+    """
+    if not is_profile_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    with profiles_lock:
+        profile = stored_profiles.get(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found or already evicted'}), 404
+    
+    if request.args.get('format') == 'folded':
+        stacks = profile['stacks']
+        processor = request.args.get('processor', type=int)
+        if processor is not None:
+            if not 0 <= processor < len(profile['processor_profiles']):
+                return jsonify({'error': 'Processor profile not found'}), 404
+            stacks = profile['processor_profiles'][processor].get('stacks', {})
+        folded = '\n'.join(f"{stack} {count}" for stack, count in stacks.items())
+        return Response(folded + '\n', mimetype='text/plain')
+    return jsonify({'success': True, 'profile': profile})
+
+@app.route('/api/system/admission', methods=['GET'])
+def admission_status():
+    """Occupancy of the processing admission lanes."""
+    return jsonify({'success': True, **admission.stats()})
+
+@app.route('/api/system/storage', methods=['GET'])
+def storage_status():
+    """Workbook write-behind state: pending write and the last failed background write."""
+    return jsonify({
+        'success': True,
+        'write_behind': app.config['WORKBOOK_WRITE_BEHIND'],
+        'pending': workbook_write_behind.is_pending(OUTPUT_XLSX_PATH),
+        'version': read_dataset_version(),
+        'durable_version': write_behind_state['durable_version'] if write_behind_state['durable_version'] is not None else read_dataset_version(),
+        'last_failure': write_behind_state['failure']
+    })
+
+
+@app.route('/api/system/memory', methods=['GET'])
+def memory_footprint():
+    """
+    Memory footprint of the resident assessment table.
+
+    Query params:
+    - compare: (optional) "1" to also measure an untyped pd.read_excel load of output.xlsx
+    """
+    try:
+        df = load_assessment_df()
+        column_bytes = df.memory_usage(deep=True, index=False)
+        report = {
+            'success': True,
+            'rows': len(df),
+            'years': int(df['Tahun'].nunique()),
+            'total_bytes': int(column_bytes.sum()),
+            'columns': {
+                col: {'dtype': str(df[col].dtype), 'bytes': int(column_bytes[col])}
+                for col in df.columns
+            }
+        }
         
-        for output_file in OUTPUT_FOLDER.glob("processed_*.xlsx"):
-            # Extract file ID from filename
-            filename_parts = output_file.name.split('_', 2)
-            if len(filename_parts) >= 2:
-                file_id = filename_parts[1]
-                
-                # Get file stats
-                stat = output_file.stat()
-                
-                files.append({
-                    'fileId': file_id,
-                    'filename': output_file.name,
-                    'size': stat.st_size,
-                    'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                    'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
-                })
+        if request.args.get('compare') == '1' and OUTPUT_XLSX_PATH.exists():
+            untyped_bytes = int(pd.read_excel(OUTPUT_XLSX_PATH).memory_usage(deep=True, index=False).sum())
+            report['untyped_bytes'] = untyped_bytes
+            report['saved_bytes'] = untyped_bytes - report['total_bytes']
         
-        return jsonify({'files': files}), 200
+        if resource is not None:
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report['process_max_rss_bytes'] = max_rss if sys.platform == 'darwin' else max_rss * 1024
         
+        return jsonify(report)
+    
     except Exception as e:
-        return jsonify({'error': f'Failed to list files: {str(e)}'}), 500
+        print(f"❌ Error measuring memory footprint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-@app.route('/api/system/info', methods=['GET'])
-def system_info():
-    """Get system information and capabilities."""
-    return jsonify({
-        'system': 'POS Data Cleaner 2',
-        'version': '2.0.0',
-        'capabilities': {
-            'file_types': list(ALLOWED_EXTENSIONS),
-            'formats_supported': ['DETAILED (56 rows)', 'BRIEF (13 rows)'],
-            'languages': ['Indonesian'],
-            'years_supported': '2014-2025',
-            'gcg_aspects': ['I-VI (Roman numerals)', 'A-H (Alphabetic)', '1-10 (Numeric)'],
-            'advanced_features': [
-                'Mathematical topology processing',
-                'Quantum superposition layouts', 
-                'DNA helix patterns',
-                'Fractal recursive structures',
-                'Multi-engine OCR (Tesseract + PaddleOCR)',
-                'ML classification (XGBoost + rules)'
-            ]
-        },
-        'processing_pipeline': [
-            'File type detection',
-            'Format classification (DETAILED vs BRIEF)',
-            'Pattern recognition (43+ indicator patterns)', 
-            'Spatial matching (distance-based pairing)',
-            'Manual.xlsx structure generation (362 rows)',
-            'Quality validation'
-        ],
-        'infrastructure': {
-            'privacy_first': True,
-            'cloud_dependencies': None,
-            'local_processing': True,
-            'max_file_size': '16MB',
-            'concurrent_processing': True
-        }
-    })
+def prepare_year(data_rows: List[Dict[str, Any]], summary_rows: List[Dict[str, Any]], year: int,
+                 auditor: str, jenis_asesmen: str, export_date: str) -> Tuple[pd.DataFrame, Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Build a year's complete rows from frontend-shaped data (as sent to /api/save).
 
+    Returns the rows including materialized subtotals and total, the total
+    summary (None without indicators) and the subtotal validation report.
+    """
+    # Build the incoming year in one step
+    year_df, client_summary = build_year_rows(data_rows, summary_rows, year, auditor, jenis_asesmen, export_date)
+    print(f"🔧 DEBUG: Built {len(year_df)} rows for year {year} ({len(client_summary)} aspect summaries)")
+    
+    # Materialize per-aspect subtotals and the year total from the indicator rows
+    totals_df, validation = materialize_totals(year_df[year_df['Type'] == 'indicator'], client_summary)
+    if validation:
+        print(f"⚠️ {len(validation)} client subtotal value(s) differ from computed values: {validation}")
+    
+    totals_summary = None
+    if len(totals_df) > 0:
+        totals_df = totals_df.assign(
+            No='', Tahun=year, Penilai=auditor, Jenis_Asesmen=jenis_asesmen, Export_Date=export_date
+        )
+        total_row = totals_df[totals_df['Type'] == 'total'].iloc[0]
+        totals_summary = {
+            'jumlah_parameter': float(total_row['Jumlah_Parameter']),
+            'bobot': float(total_row['Bobot']),
+            'skor': float(total_row['Skor']),
+            'capaian': float(total_row['Capaian']),
+            'penjelasan': str(total_row['Penjelasan'])
+        }
+        year_df = pd.concat([year_df, totals_df.reindex(columns=ASSESSMENT_COLUMNS)], ignore_index=True)
+    return year_df, totals_summary, validation
 
 @app.route('/api/save', methods=['POST'])
 def save_assessment():
@@ -479,172 +2811,248 @@ def save_assessment():
         assessment_id = f"{data.get('year', 'unknown')}_{data.get('auditor', 'unknown')}_{str(uuid.uuid4())[:8]}"
         saved_at = datetime.now().isoformat()
         
-        output_xlsx_path = Path(__file__).parent.parent / 'web-output' / 'output.xlsx'
+        year = data.get('year')
+        if not str(year).isdigit():
+            return jsonify({'success': False, 'error': 'A numeric year is required'}), 400
+        year = int(year)
+        auditor = data.get('auditor', 'unknown')
+        jenis_asesmen = data.get('jenis_asesmen', 'Internal')
+        
+        year_df, totals_summary, validation = prepare_year(
+            data.get('data', []), data.get('aspectSummaryData', []),
+            year, auditor, jenis_asesmen, saved_at[:10]
+        )
         
-        # Load existing XLSX data and COMPLETELY REPLACE year's data (including deletions)
-        all_rows = []
-        if output_xlsx_path.exists():
+        version = read_dataset_version()
+        with dataset_lock:
+            # Load existing XLSX data; the year's rows are COMPLETELY REPLACED (including deletions)
+            existing_df = pd.DataFrame(columns=ASSESSMENT_COLUMNS)
             try:
-                existing_df = pd.read_excel(output_xlsx_path)
-                current_year = data.get('year')
-                
-                print(f"🔧 DEBUG: Loading existing XLSX with {len(existing_df)} rows")
-                print(f"🔧 DEBUG: Current year to save: {current_year}")
-                print(f"🔧 DEBUG: Existing years in file: {existing_df['Tahun'].unique().tolist()}")
-                
-                # COMPLETELY REMOVE all existing data for this year (this handles deletions)
-                if current_year:
-                    original_count = len(existing_df)
-                    existing_df = existing_df[existing_df['Tahun'] != current_year]
-                    removed_count = original_count - len(existing_df)
-                    print(f"🔧 DEBUG: COMPLETELY REMOVED {removed_count} rows for year {current_year} (including deletions)")
-                    print(f"🔧 DEBUG: Preserved {len(existing_df)} rows from other years")
-                
-                # Convert remaining data back to list format
-                for _, row in existing_df.iterrows():
-                    all_rows.append(row.to_dict())
-                    
-                print(f"🔧 DEBUG: Starting with {len(all_rows)} rows from other years")
+                existing_df = load_assessment_df()
+                print(f"🔧 DEBUG: Loading existing XLSX with {len(existing_df)} rows, saving year {year}")
             except Exception as e:
                 print(f"⚠️ Could not read existing XLSX: {e}")
-        
-        # Process new data and add to all_rows
-        year = data.get('year', 'unknown')
-        auditor = data.get('auditor', 'unknown')
-        jenis_asesmen = data.get('jenis_asesmen', 'Internal')
-        
-        # Process main indicator data
-        for row in data.get('data', []):
-            # Map frontend data structure to XLSX format
-            row_id = row.get('id', row.get('no', ''))
-            section = row.get('aspek', row.get('section', ''))
             
-            # Determine Level and Type based on data structure
-            if str(row_id).isdigit():
-                level = "2"
-                row_type = "indicator"
-            else:
-                level = "1"
-                row_type = "header"
+            # Drop the year with a boolean mask, concat, dedupe and sort columnar
+            df_sorted = merge_year(existing_df, year_df, year)
             
-            xlsx_row = {
-                'Level': level,
-                'Type': row_type,
-                'Section': section,
-                'No': row_id,
-                'Deskripsi': row.get('deskripsi', ''),
-                'Jumlah_Parameter': row.get('jumlah_parameter', ''),
-                'Bobot': row.get('bobot', ''),
-                'Skor': row.get('skor', ''),
-                'Capaian': row.get('capaian', ''),
-                'Penjelasan': row.get('penjelasan', ''),
-                'Tahun': year,
-                'Penilai': auditor,
-                'Jenis_Asesmen': jenis_asesmen,
-                'Export_Date': saved_at[:10]
-            }
-            all_rows.append(xlsx_row)
-        
-        # Process aspect summary data (if provided)
-        aspect_summary_data = data.get('aspectSummaryData', [])
-        if aspect_summary_data:
-            print(f"🔧 DEBUG: Processing {len(aspect_summary_data)} aspect summary rows")
+            if len(df_sorted) > 0:
+                version = store_assessment_df(df_sorted)
+                print(f"✅ Saved to output.xlsx with {len(df_sorted)} rows (sorted: year→aspek→no→type), version {version}")
             
-            for summary_row in aspect_summary_data:
-                section = summary_row.get('aspek', '')
-                deskripsi = summary_row.get('deskripsi', '')
-                bobot = summary_row.get('bobot', 0)
-                skor = summary_row.get('skor', 0)
-                
-                # Skip empty aspects or meaningless default data
-                if not section or not deskripsi or (bobot == 0 and skor == 0):
-                    continue
-                    
-                # Skip if this looks like an unedited default row (just roman numerals with no real data)
-                if section in ['I', 'II', 'III', 'IV', 'V', 'VI'] and not deskripsi.strip():
-                    continue
-                    
-                # Row 1: Header for this aspect
-                header_row = {
-                    'Level': "1",
-                    'Type': 'header',
-                    'Section': section,
-                    'No': '',
-                    'Deskripsi': summary_row.get('deskripsi', ''),
-                    'Jumlah_Parameter': '',
-                    'Bobot': '',
-                    'Skor': '',
-                    'Capaian': '',
-                    'Penjelasan': '',
-                    'Tahun': year,
-                    'Penilai': auditor,
-                    'Jenis_Asesmen': jenis_asesmen,
-                    'Export_Date': saved_at[:10]
-                }
-                all_rows.append(header_row)
-                
-                # Row 2: Subtotal for this aspect
-                subtotal_row = {
-                    'Level': "1", 
-                    'Type': 'subtotal',
-                    'Section': section,
-                    'No': '',
-                    'Deskripsi': f'JUMLAH {section}',
-                    'Jumlah_Parameter': '',
-                    'Bobot': summary_row.get('bobot', ''),
-                    'Skor': summary_row.get('skor', ''),
-                    'Capaian': summary_row.get('capaian', ''),
-                    'Penjelasan': summary_row.get('penjelasan', ''),
-                    'Tahun': year,
-                    'Penilai': auditor,
-                    'Jenis_Asesmen': jenis_asesmen,
-                    'Export_Date': saved_at[:10]
-                }
-                all_rows.append(subtotal_row)
+        return jsonify({
+            'success': True,
+            'message': 'Data berhasil disimpan',
+            'assessment_id': assessment_id,
+            'saved_at': saved_at,
+            'version': version,
+            'totals': totals_summary,
+            'validation': validation,
+            'write_failure': take_write_failure()
+        })
+        
+    except Exception as e:
+        print(f"❌ Error saving assessment: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+PATCH_FIELD_COLUMNS = {
+    'deskripsi': 'Deskripsi',
+    'jumlah_parameter': 'Jumlah_Parameter',
+    'bobot': 'Bobot',
+    'skor': 'Skor',
+    'capaian': 'Capaian',
+    'penjelasan': 'Penjelasan'
+}
+
+# Patch fields that must be numbers (None clears the value)
+PATCH_NUMERIC_FIELDS = {'jumlah_parameter', 'bobot', 'skor', 'capaian'}
+
+def patch_row_key(item: Dict[str, Any]) -> Tuple[int, str, str]:
+    """
+    (Tahun, Section, No) key of a patch item; raises ValueError when incomplete.
+
+    No is normalized like row_keys ('7', legacy '1.1'), so fractional
+    sub-numbers stay distinct rows.
+    """
+    year = pd.to_numeric(item.get('year', item.get('tahun')), errors='coerce')
+    section = item.get('aspek', item.get('section'))
+    row_no = pd.to_numeric(item.get('id', item.get('no')), errors='coerce')
+    if pd.isna(year) or not section or pd.isna(row_no):
+        raise ValueError(f'Patch item needs year, aspek and a numeric id: {item}')
+    return int(year), str(section), no_text(pd.Series([row_no], dtype='float64')).iloc[0]
+
+def patch_values(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Column values of a patch item; raises ValueError for non-numeric scores."""
+    values = {}
+    for field, col in PATCH_FIELD_COLUMNS.items():
+        if field not in item:
+            continue
+        value = item[field]
+        if field in PATCH_NUMERIC_FIELDS and value is not None:
+            number = pd.to_numeric(value, errors='coerce') if not isinstance(value, bool) else np.nan
+            if pd.isna(number) or not math.isfinite(number):
+                raise ValueError(f'{field} must be a number, got {value!r}')
+            value = float(number)
+        values[col] = value
+    return values
+
+def rematerialize_year_totals(df: pd.DataFrame, year: int, indicator_sections: set) -> pd.DataFrame:
+    """
+    Recompute one year's subtotal and total rows after indicator edits.
+
+    indicator_sections are the aspects that had indicator rows before the
+    edit. Only what cannot be derived is carried over from the stored
+    subtotals: a penjelasan that differs from the derived classification
+    (written by the assessor) and the subtotals of BRIEF-only aspects. An
+    aspect whose indicators were all deleted loses its subtotal.
+    """
+    in_year = df['Tahun'] == year
+    indicators = df[in_year & (df['Type'] == 'indicator')]
+    stored = df[in_year & (df['Type'] == 'subtotal')]
+    skor = pd.to_numeric(stored['Skor'], errors='coerce').fillna(0)
+    bobot = pd.to_numeric(stored['Bobot'], errors='coerce').fillna(0)
+    penjelasan = stored['Penjelasan'].fillna('').astype(str).str.strip()
+    manual = penjelasan.where(penjelasan != classify_capaian(skor, bobot), '')
+    
+    sections = stored['Section'].astype(str)
+    brief_only = ~sections.isin({str(section) for section in indicator_sections})
+    keep = brief_only | sections.isin(indicators['Section'].astype(str))
+    stored_summary = pd.DataFrame({
+        'aspek': sections,
+        'jumlah_parameter': stored['Jumlah_Parameter'],
+        'bobot': stored['Bobot'],
+        'skor': stored['Skor'],
+        'capaian': stored['Capaian'],
+        'penjelasan': manual
+    })[keep]
+    totals_df, _ = materialize_totals(indicators, stored_summary)
+    
+    first = df[in_year].iloc[0] if in_year.any() else pd.Series(dtype=object)
+    df = df[~(in_year & df['Type'].isin(['subtotal', 'total']))]
+    if len(totals_df) > 0:
+        totals_df = totals_df.assign(
+            No='', Tahun=year, Penilai=first.get('Penilai'), Jenis_Asesmen=first.get('Jenis_Asesmen'),
+            Export_Date=datetime.now().isoformat()[:10]
+        )
+        df = pd.concat([df, totals_df.reindex(columns=df.columns)], ignore_index=True)
+    return df
+
+
+@app.route('/api/save/patch', methods=['POST', 'PATCH'])
+def patch_assessment():
+    """
+    Apply row-level edits to output.xlsx without resending the whole year.
+
+    Expected JSON:
+    - version: dataset version the client last loaded (optimistic concurrency)
+    - upserts: [{year, aspek, id, <changed fields>}] keyed by (Tahun, Section, No)
+    - deletes: [{year, aspek, id}]
+    - auditor / jenis_asesmen: (optional) used for rows inserted into a new year
+    
+    Only the touched indicator rows are modified; the affected years' subtotals
+    and totals are re-materialized. Answers 409 when the dataset moved on.
+    """
+    try:
+        data = request.json or {}
+        upserts = data.get('upserts', [])
+        deletes = data.get('deletes', [])
+        if 'version' not in data:
+            return jsonify({'success': False, 'error': 'version is required'}), 400
+        try:
+            client_version = int(data['version'])
+            upsert_keys = [patch_row_key(item) for item in upserts]
+            upsert_values = [patch_values(item) for item in upserts]
+            delete_keys = {patch_row_key(item) for item in deletes}
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        # Convert to DataFrame and save XLSX
-        if all_rows:
-            df = pd.DataFrame(all_rows)
+        with dataset_lock:
+            current_version = read_dataset_version()
+            if client_version != current_version:
+                return jsonify({
+                    'success': False,
+                    'error': 'Dataset was modified by another save; reload and retry',
+                    'version': current_version
+                }), 409
             
-            # Remove any duplicate rows
-            df_unique = df.drop_duplicates(subset=['Tahun', 'Section', 'No', 'Deskripsi'], keep='last')
-            print(f"🔧 DEBUG: Removed {len(df) - len(df_unique)} duplicate rows")
+            # Editable copy: categoricals/nullable ints accept any value until the schema is re-applied on store
+            df = load_assessment_df().astype(object)
+            tahun_numeric = pd.to_numeric(df['Tahun'], errors='coerce')
+            no_keys = no_text(pd.to_numeric(df['No'], errors='coerce').astype('float64'))
+            is_indicator = df['Type'] == 'indicator'
+            indicator_sections = df[is_indicator].groupby(tahun_numeric[is_indicator])['Section'].agg(lambda sections: set(sections.astype(str)))
+            row_index = {
+                (int(tahun), str(section), no): idx
+                for idx, tahun, section, no in zip(
+                    df.index[is_indicator], tahun_numeric[is_indicator],
+                    df['Section'][is_indicator], no_keys[is_indicator]
+                )
+                if pd.notna(tahun) and no
+            }
             
-            # Custom sorting: year → aspek → no, then organize headers and subtotals properly
-            def sort_key(row):
-                year = row['Tahun']
-                section = row['Section']
-                no = row['No']
-                row_type = row['Type']
-                
-                # Convert 'no' to numeric for proper sorting, handle empty values
-                try:
-                    no_numeric = int(no) if str(no).isdigit() else 9999
-                except (ValueError, TypeError):
-                    no_numeric = 9999
-                
-                # Type priority: header=0, indicators=1, subtotal=2
-                type_priority = {'header': 0, 'indicator': 1, 'subtotal': 2}.get(row_type, 1)
-                
-                return (year, section, type_priority, no_numeric)
+            updated, new_rows, rescored = 0, [], []
+            for key, values in zip(upsert_keys, upsert_values):
+                if key in row_index:
+                    idx = row_index[key]
+                    for col, value in values.items():
+                        df.at[idx, col] = value
+                    if 'Skor' in values or 'Bobot' in values:
+                        rescored.append(idx)
+                    updated += 1
+                else:
+                    year_rows = df[df['Tahun'] == key[0]]
+                    new_rows.append({
+                        'Level': 2,
+                        'Type': 'indicator',
+                        'Section': key[1],
+                        'No': float(key[2]),
+                        'Tahun': key[0],
+                        'Penilai': year_rows['Penilai'].iloc[0] if len(year_rows) > 0 else data.get('auditor', 'unknown'),
+                        'Jenis_Asesmen': year_rows['Jenis_Asesmen'].iloc[0] if len(year_rows) > 0 else data.get('jenis_asesmen', 'Internal'),
+                        'Export_Date': datetime.now().isoformat()[:10],
+                        **values
+                    })
             
-            # Apply custom sorting
-            df_sorted = df_unique.loc[df_unique.apply(sort_key, axis=1).sort_values().index]
+            # Changed Skor/Bobot invalidate the row's Capaian and Penjelasan (frontend rules)
+            if rescored:
+                skor = pd.to_numeric(df.loc[rescored, 'Skor'], errors='coerce').fillna(0)
+                bobot = pd.to_numeric(df.loc[rescored, 'Bobot'], errors='coerce').fillna(0)
+                df.loc[rescored, 'Capaian'] = calculate_capaian(skor, bobot)
+                df.loc[rescored, 'Penjelasan'] = classify_capaian(skor, bobot)
             
-            # Create directory and save XLSX
-            os.makedirs(output_xlsx_path.parent, exist_ok=True)
-            df_sorted.to_excel(output_xlsx_path, index=False)
-            print(f"✅ Saved to output.xlsx with {len(df_sorted)} rows (sorted: year→aspek→no→type) at: {output_xlsx_path}")
+            deleted_index = [row_index[key] for key in delete_keys if key in row_index]
+            df = df.drop(index=deleted_index)
+            if new_rows:
+                new_df = pd.DataFrame(new_rows).reindex(columns=df.columns)
+                skor = pd.to_numeric(new_df['Skor'], errors='coerce').fillna(0)
+                bobot = pd.to_numeric(new_df['Bobot'], errors='coerce').fillna(0)
+                new_df['Capaian'] = calculate_capaian(skor, bobot)
+                new_df['Penjelasan'] = classify_capaian(skor, bobot)
+                df = pd.concat([df, new_df], ignore_index=True)
             
+            touched_years = sorted({key[0] for key in upsert_keys} | {key[0] for key in delete_keys})
+            for year in touched_years:
+                df = rematerialize_year_totals(df, year, indicator_sections.get(year, set()))
+            
+            version = store_assessment_df(sort_assessment_rows(df))
+        
+        print(f"✅ Patched output.xlsx: {updated} updated, {len(new_rows)} inserted, {len(deleted_index)} deleted (version {version})")
         return jsonify({
             'success': True,
-            'message': 'Data berhasil disimpan',
-            'assessment_id': assessment_id,
-            'saved_at': saved_at
+            'version': version,
+            'updated': updated,
+            'inserted': len(new_rows),
+            'deleted': len(deleted_index),
+            'years': touched_years,
+            'write_failure': take_write_failure()
         })
-        
+    
     except Exception as e:
-        print(f"❌ Error saving assessment: {str(e)}")
+        print(f"❌ Error patching assessment: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -654,13 +3062,36 @@ def save_assessment():
 # generate_output_xlsx function removed - now saving directly to XLSX
 
 
+def text_column(values: pd.Series, default: str = '') -> pd.Series:
+    """Categorical/object column as plain strings with a default for missing values."""
+    return values.astype(object).fillna(default).astype(str)
+
+def no_text(values: pd.Series) -> pd.Series:
+    """No as strings: '7' for whole numbers, '1.1' for legacy sub-numbers, '' when missing."""
+    numeric = values.astype('float64').round(SCORE_DECIMALS)
+    text = numeric.astype(str).str.replace(r'\.0$', '', regex=True)
+    return text.where(numeric.notna(), '')
+
+def penilaian_records(rows: pd.DataFrame, ids: pd.Series) -> List[Dict[str, Any]]:
+    """Frontend PenilaianRow records built from typed assessment rows in one pass."""
+    return json_records(pd.DataFrame({
+        'id': ids,
+        'aspek': text_column(rows['Section']),
+        'deskripsi': text_column(rows['Deskripsi']),
+        'jumlah_parameter': rows['Jumlah_Parameter'].fillna(0),
+        'bobot': rows['Bobot'].fillna(0),
+        'skor': rows['Skor'].fillna(0),
+        'capaian': rows['Capaian'].fillna(0),
+        'penjelasan': text_column(rows['Penjelasan'], 'Tidak Baik')
+    }, index=rows.index))
+
 @app.route('/api/load/<int:year>', methods=['GET'])
 def load_assessment_by_year(year):
     """
     Load assessment data for a specific year from output.xlsx
     """
     try:
-        output_xlsx_path = Path(__file__).parent.parent / 'web-output' / 'output.xlsx'
+        output_xlsx_path = OUTPUT_XLSX_PATH
         
         if not output_xlsx_path.exists():
             return jsonify({
@@ -669,8 +3100,8 @@ def load_assessment_by_year(year):
                 'message': f'No saved data found for year {year}'
             })
         
-        # Read XLSX data
-        df = pd.read_excel(output_xlsx_path)
+        # Typed, resident copy of output.xlsx
+        df = load_assessment_df()
         
         # Filter for the requested year
         year_df = df[df['Tahun'] == year]
@@ -689,72 +3120,40 @@ def load_assessment_by_year(year):
             print(f"🔧 DEBUG: Detected format: {format_type}")
             print(f"🔧 DEBUG: Found {len(indicator_rows)} indicators, {len(subtotal_rows)} subtotals, {len(header_rows)} headers")
             
-            # Process indicator data for main table (both BRIEF and DETAILED)
-            main_table_data = []
-            for _, row in indicator_rows.iterrows():
-                row_id = row.get('No', '')
-                if pd.isna(row_id) or str(row_id).lower() in ['nan', '', 'none']:
-                    continue
-                    
-                aspek = str(row.get('Section', ''))
-                deskripsi = str(row.get('Deskripsi', ''))
-                if not aspek or not deskripsi:
-                    continue
-                
-                penjelasan = row.get('Penjelasan', '')
-                if pd.isna(penjelasan) or str(penjelasan).lower() == 'nan':
-                    penjelasan = 'Tidak Baik'
-                
-                main_table_data.append({
-                    'id': str(row_id),
-                    'aspek': aspek,
-                    'deskripsi': deskripsi,
-                    'jumlah_parameter': int(row.get('Jumlah_Parameter', 0)) if pd.notna(row.get('Jumlah_Parameter')) else 0,
-                    'bobot': float(row.get('Bobot', 0)) if pd.notna(row.get('Bobot')) else 0,
-                    'skor': float(row.get('Skor', 0)) if pd.notna(row.get('Skor')) else 0,
-                    'capaian': float(row.get('Capaian', 0)) if pd.notna(row.get('Capaian')) else 0,
-                    'penjelasan': str(penjelasan)
-                })
+            # Indicator data for main table (both BRIEF and DETAILED); skip rows without No/aspek/deskripsi
+            indicator_rows = indicator_rows[
+                indicator_rows['No'].notna() & indicator_rows['Section'].notna() & indicator_rows['Deskripsi'].notna()
+            ]
+            main_table_data = penilaian_records(indicator_rows, no_text(indicator_rows['No']))
             
-            # Process aspek summary data (subtotals) for DETAILED mode
+            # Aspek summary data (subtotals) for DETAILED mode
             aspek_summary_data = []
             if is_detailed and len(subtotal_rows) > 0:
-                for _, row in subtotal_rows.iterrows():
-                    aspek = str(row.get('Section', ''))
-                    if not aspek:
-                        continue
-                        
-                    penjelasan = row.get('Penjelasan', '')
-                    if pd.isna(penjelasan) or str(penjelasan).lower() == 'nan':
-                        penjelasan = 'Tidak Baik'
-                    
-                    aspek_summary_data.append({
-                        'id': f'summary-{aspek}',
-                        'aspek': aspek,
-                        'deskripsi': str(row.get('Deskripsi', '')),
-                        'jumlah_parameter': int(row.get('Jumlah_Parameter', 0)) if pd.notna(row.get('Jumlah_Parameter')) else 0,
-                        'bobot': float(row.get('Bobot', 0)) if pd.notna(row.get('Bobot')) else 0,
-                        'skor': float(row.get('Skor', 0)) if pd.notna(row.get('Skor')) else 0,
-                        'capaian': float(row.get('Capaian', 0)) if pd.notna(row.get('Capaian')) else 0,
-                        'penjelasan': str(penjelasan)
-                    })
+                subtotal_rows = subtotal_rows[subtotal_rows['Section'].notna()]
+                aspek_summary_data = penilaian_records(subtotal_rows, 'summary-' + text_column(subtotal_rows['Section']))
             
             print(f"🔧 DEBUG: Processed {len(main_table_data)} indicators, {len(aspek_summary_data)} aspect summaries")
             
+            # Year total is materialized at save time; return it as stored
+            total_rows = year_df[year_df['Type'] == 'total']
+            total_summary = total_row_summary(total_rows.iloc[0]) if len(total_rows) > 0 else None
+            
             # Get auditor and jenis_asesmen from first row
-            auditor = year_df.iloc[0].get('Penilai', 'Unknown') if len(year_df) > 0 else 'Unknown'
-            jenis_asesmen = year_df.iloc[0].get('Jenis_Asesmen', 'Internal') if len(year_df) > 0 else 'Internal'
+            auditor = text_column(year_df['Penilai'], 'Unknown').iloc[0]
+            jenis_asesmen = text_column(year_df['Jenis_Asesmen'], 'Internal').iloc[0]
             
             return jsonify({
                 'success': True,
                 'data': main_table_data,
                 'aspek_summary_data': aspek_summary_data,
+                'total_summary': total_summary,
                 'format_type': format_type,
                 'is_detailed': is_detailed,
                 'auditor': auditor,
                 'jenis_asesmen': jenis_asesmen,
                 'method': 'xlsx_load',
-                'saved_at': year_df.iloc[0].get('Export_Date', '') if len(year_df) > 0 else '',
+                'version': read_dataset_version(),
+                'saved_at': text_column(year_df['Export_Date']).iloc[0],
                 'message': f'Loaded {len(main_table_data)} indicators + {len(aspek_summary_data)} summaries for year {year} ({format_type} format)'
             })
         else:
@@ -773,13 +3172,143 @@ def load_assessment_by_year(year):
         }), 500
 
 
+@app.route('/api/snapshots', methods=['GET'])
+def list_snapshots():
+    """Snapshot versions per year (optionally ?year=), newest first."""
+    manifest = read_snapshot_manifest()
+    year = request.args.get('year', type=int)
+    years = {
+        int(key): [
+            {field: value for field, value in segment.items() if field != 'file'}
+            for segment in reversed(segments)
+        ]
+        for key, segments in manifest['years'].items()
+        if year is None or int(key) == year
+    }
+    return jsonify({'success': True, 'version': read_dataset_version(), 'years': years})
+
+@app.route('/api/snapshots/<int:year>', methods=['GET'])
+def get_year_snapshot(year):
+    """A year's rows as of ?version= (default: latest snapshot), in dashboard record format."""
+    version = request.args.get('version', type=int)
+    try:
+        snapshot = load_year_snapshot(year, version if version is not None else read_dataset_version())
+    except Exception as e:
+        print(f"❌ Error loading snapshot: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    if snapshot is None:
+        return jsonify({'success': False, 'error': f'No snapshot of year {year} at or before that version'}), 404
+    
+    segment_version, rows = snapshot
+    return jsonify({
+        'success': True,
+        'year': year,
+        'version': segment_version,
+        'data': dashboard_records(rows),
+        'total': next(iter(year_totals(rows).values()), None)
+    })
+
+@app.route('/api/snapshots/<int:year>/rollback', methods=['POST'])
+def rollback_year(year):
+    """
+    Restore a year to its state as of a snapshot version.
+
+    Expected JSON:
+    - version: snapshot version to restore
+    - base_version: (optional) current dataset version the client saw; 409 if it moved on
+
+    The rollback is itself a save: it bumps the dataset version and is snapshotted.
+    """
+    data = request.json or {}
+    if 'version' not in data:
+        return jsonify({'success': False, 'error': 'version is required'}), 400
+    
+    try:
+        with dataset_lock:
+            current_version = read_dataset_version()
+            if 'base_version' in data and int(data['base_version']) != current_version:
+                return jsonify({
+                    'success': False,
+                    'error': 'Dataset was modified by another save; reload and retry',
+                    'version': current_version
+                }), 409
+            snapshot = load_year_snapshot(year, int(data['version']))
+            if snapshot is None:
+                return jsonify({'success': False, 'error': f'No snapshot of year {year} at or before version {data["version"]}'}), 404
+            
+            segment_version, rows = snapshot
+            df = load_assessment_df()
+            restored = sort_assessment_rows(pd.concat(
+                [df[df['Tahun'] != year].astype(object), rows.astype(object)], ignore_index=True
+            ))
+            version = store_assessment_df(restored)
+        
+        print(f"🔧 DEBUG: Rolled back year {year} to snapshot version {segment_version}")
+        return jsonify({
+            'success': True,
+            'message': f'Year {year} restored to version {segment_version}',
+            'restored_from': segment_version,
+            'rows': int(len(rows)),
+            'version': version,
+            'write_failure': take_write_failure()
+        })
+    
+    except Exception as e:
+        print(f"❌ Error rolling back year {year}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def dashboard_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Dashboard records in one columnar pass (missing numbers become 0)."""
+    return json_records(pd.DataFrame({
+        'row_key': row_keys(df),
+        'id': no_text(df['No']),
+        'aspek': text_column(df['Section']),
+        'deskripsi': text_column(df['Deskripsi']),
+        'jumlah_parameter': df['Jumlah_Parameter'].astype('float64').fillna(0),
+        'bobot': df['Bobot'].fillna(0),
+        'skor': df['Skor'].fillna(0),
+        'capaian': df['Capaian'].fillna(0),
+        'penjelasan': text_column(df['Penjelasan']),
+        'year': df['Tahun'],
+        'auditor': text_column(df['Penilai'], 'Unknown'),
+        'jenis_asesmen': text_column(df['Jenis_Asesmen'], 'Internal')
+    }))
+
+def year_totals(df: pd.DataFrame) -> Dict[int, Dict[str, Any]]:
+    """Per-year total summaries from the materialized total rows."""
+    return {int(row['Tahun']): total_row_summary(row) for _, row in df[df['Type'] == 'total'].iterrows()}
+
+def incremental_response(df: pd.DataFrame, changes: Dict[str, Any], since: int, records) -> Dict[str, Any]:
+    """Change feed payload: changed rows, tombstones and the years they belong to."""
+    changed = df[row_keys(df).isin(changes['upserted'])]
+    return {
+        'success': True,
+        'incremental': True,
+        'since': since,
+        'version': changes['version'],
+        'changed_years': changes['years'],
+        'upserted': records(changed),
+        'deleted': changes['deleted'],
+        'message': f"{len(changed)} changed and {len(changes['deleted'])} deleted row(s) since version {since}"
+    }
+
 @app.route('/api/dashboard-data', methods=['GET'])
 def get_dashboard_data():
     """
     Get all assessment data from output.xlsx for dashboard visualization
+
+    With ?since=<version> only the rows changed after that version are
+    returned, plus tombstones (row keys) for deleted rows. If that history has
+    been compacted the full dataset is returned with full_resync set.
     """
     try:
-        output_xlsx_path = Path(__file__).parent.parent / 'web-output' / 'output.xlsx'
+        since = request.args.get('since', type=int)
+        # Read the version first: a save racing this request is re-sent next sync
+        changes = dataset_changes_since(since) if since is not None else None
+        version = changes['version'] if changes else read_dataset_version()
+        
+
+        output_xlsx_path = OUTPUT_XLSX_PATH
         
         if not output_xlsx_path.exists():
             return jsonify({
@@ -788,46 +3317,19 @@ def get_dashboard_data():
                 'message': 'No dashboard data available. Please save some assessments first.'
             })
         
-        # Read XLSX data
-        df = pd.read_excel(output_xlsx_path)
+        # Typed, resident copy of output.xlsx
+        df = load_assessment_df()
+        
+        if changes is not None:
+            payload = incremental_response(df, changes, since, dashboard_records)
+            totals = year_totals(df[df['Tahun'].isin(changes['years'])])
+            payload['totals'] = {year: totals.get(year) for year in changes['years']}
+            return jsonify(payload)
         
         print(f"🔧 DEBUG: Dashboard loading {len(df)} rows from output.xlsx")
         print(f"🔧 DEBUG: Years in file: {df['Tahun'].unique().tolist()}")
-        print(f"🔧 DEBUG: Sample rows: {df[['Tahun', 'Section', 'Skor']].head().to_dict('records')}")
         
-        # Convert to dashboard format
-        dashboard_data = []
-        for _, row in df.iterrows():
-            # Handle NaN values properly
-            bobot = row.get('Bobot', 0)
-            skor = row.get('Skor', 0)
-            capaian = row.get('Capaian', 0)
-            jumlah_param = row.get('Jumlah_Parameter', 0)
-            
-            # Convert NaN to 0 for numeric fields
-            if pd.isna(bobot):
-                bobot = 0
-            if pd.isna(skor):
-                skor = 0
-            if pd.isna(capaian):
-                capaian = 0
-            if pd.isna(jumlah_param):
-                jumlah_param = 0
-                
-            dashboard_item = {
-                'id': str(row.get('No', '')),
-                'aspek': str(row.get('Section', '')),
-                'deskripsi': str(row.get('Deskripsi', '')),
-                'jumlah_parameter': float(jumlah_param),
-                'bobot': float(bobot),
-                'skor': float(skor),
-                'capaian': float(capaian),
-                'penjelasan': str(row.get('Penjelasan', '')),
-                'year': int(row.get('Tahun', 2022)),
-                'auditor': str(row.get('Penilai', 'Unknown')),
-                'jenis_asesmen': str(row.get('Jenis_Asesmen', 'Internal'))
-            }
-            dashboard_data.append(dashboard_item)
+        dashboard_data = dashboard_records(df)
         
         # Group by year for multi-year support
         years_data = {}
@@ -838,12 +3340,20 @@ def get_dashboard_data():
                     'year': year,
                     'auditor': item['auditor'],
                     'jenis_asesmen': item['jenis_asesmen'],
+                    'total': None,
                     'data': []
                 }
             years_data[year]['data'].append(item)
         
+        # Per-year totals are materialized at save time (Type 'total')
+        for year, total in year_totals(df).items():
+            if year in years_data:
+                years_data[year]['total'] = total
+        
         return jsonify({
             'success': True,
+            'version': version,
+            'full_resync': since is not None,
             'years_data': years_data,
             'total_rows': len(dashboard_data),
             'available_years': list(years_data.keys()),
@@ -859,14 +3369,40 @@ def get_dashboard_data():
         }), 500
 
 
+def chart_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """graphics-2 GCGData records; Level follows the row type (section level by default)."""
+    level = df['Type'].astype(object).str.lower().map({'total': 4, 'header': 1, 'indicator': 2, 'subtotal': 3}).fillna(3)
+    return json_records(pd.DataFrame({
+        'row_key': row_keys(df),
+        'Tahun': df['Tahun'],
+        'Skor': df['Skor'].fillna(0),
+        'Level': level.astype(int),
+        'Section': text_column(df['Section']),
+        'Capaian': df['Capaian'].fillna(0),
+        'Bobot': df['Bobot'],
+        'Jumlah_Parameter': df['Jumlah_Parameter'].astype('float64'),
+        'Penjelasan': text_column(df['Penjelasan']),
+        'Penilai': text_column(df['Penilai'], 'Unknown'),
+        'No': no_text(df['No']),
+        'Deskripsi': text_column(df['Deskripsi']),
+        'Jenis_Penilaian': text_column(df['Jenis_Asesmen'], 'Internal')
+    }))
+
 @app.route('/api/gcg-chart-data', methods=['GET'])
 def get_gcg_chart_data():
     """
     Get assessment data formatted for GCGChart component (graphics-2 format)
     Returns data with Level hierarchy as expected by processGCGData function
+
+    Supports ?since=<version> like /api/dashboard-data.
     """
     try:
-        output_xlsx_path = Path(__file__).parent.parent / 'web-output' / 'output.xlsx'
+        since = request.args.get('since', type=int)
+        changes = dataset_changes_since(since) if since is not None else None
+        version = changes['version'] if changes else read_dataset_version()
+        
+
+        output_xlsx_path = OUTPUT_XLSX_PATH
         
         if not output_xlsx_path.exists():
             return jsonify({
@@ -875,55 +3411,23 @@ def get_gcg_chart_data():
                 'message': 'No chart data available. Please save some assessments first.'
             })
         
-        # Read XLSX data
-        df = pd.read_excel(output_xlsx_path)
+        # Typed, resident copy of output.xlsx
+        df = load_assessment_df()
+        
+        if changes is not None:
+            return jsonify(incremental_response(df, changes, since, chart_records))
         
         print(f"🎨 GCG Chart Data: Loading {len(df)} rows from output.xlsx")
         
-        # Convert to graphics-2 GCGData format
-        gcg_data = []
-        for _, row in df.iterrows():
-            # Determine level based on row type
-            level = 3  # Default to section level
-            row_type = str(row.get('Type', '')).lower()
-            
-            if row_type == 'total':
-                level = 4
-            elif row_type == 'header':
-                level = 1
-            elif row_type == 'indicator':
-                level = 2
-            elif row_type == 'subtotal':
-                level = 3
-            
-            # Handle NaN values
-            tahun = int(row.get('Tahun', 2022))
-            skor = float(row.get('Skor', 0)) if not pd.isna(row.get('Skor', 0)) else 0
-            capaian = float(row.get('Capaian', 0)) if not pd.isna(row.get('Capaian', 0)) else 0
-            bobot = float(row.get('Bobot', 0)) if not pd.isna(row.get('Bobot', 0)) else None
-            jumlah_param = float(row.get('Jumlah_Parameter', 0)) if not pd.isna(row.get('Jumlah_Parameter', 0)) else None
-            
-            gcg_item = {
-                'Tahun': tahun,
-                'Skor': skor,
-                'Level': level,
-                'Section': str(row.get('Section', '')),
-                'Capaian': capaian,
-                'Bobot': bobot,
-                'Jumlah_Parameter': jumlah_param,
-                'Penjelasan': str(row.get('Penjelasan', '')),
-                'Penilai': str(row.get('Penilai', 'Unknown')),
-                'No': str(row.get('No', '')),
-                'Deskripsi': str(row.get('Deskripsi', '')),
-                'Jenis_Penilaian': str(row.get('Jenis_Asesmen', 'Internal'))
-            }
-            gcg_data.append(gcg_item)
+        gcg_data = chart_records(df)
         
         return jsonify({
             'success': True,
+            'version': version,
+            'full_resync': since is not None,
             'data': gcg_data,
             'total_rows': len(gcg_data),
-            'available_years': list(set([item['Tahun'] for item in gcg_data])),
+            'available_years': sorted(int(year) for year in df['Tahun'].unique()),
             'message': f'Loaded GCG chart data: {len(gcg_data)} rows'
         })
         
@@ -936,6 +3440,221 @@ def get_gcg_chart_data():
         }), 500
 
 
+@app.route('/api/search', methods=['GET'])
+def search_assessments():
+    """
+    Full-text search over Deskripsi and Penjelasan of all saved years.
+    
+    Query parameters:
+    - q: search text (Indonesian-aware tokenization and stemming)
+    - year, section: (optional) restrict results
+    - limit: (optional) number of results, default 20, max 100
+    """
+    started = time.perf_counter()
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Query parameter q is required'}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    
+    try:
+        terms, total_matches, results = search_index.search(
+            load_assessment_df(), query,
+            year=request.args.get('year', type=int),
+            section=request.args.get('section') or None,
+            limit=limit
+        )
+        return jsonify({
+            'success': True,
+            'query': query,
+            'terms': terms,
+            'total_matches': total_matches,
+            'results': results,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+    
+    except Exception as e:
+        print(f"❌ Error searching assessments: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+RECONCILE_MIN_CONFIDENCE = 0.35  # cosine similarity below which a row counts as unmatched
+
+def similarity_features(text: str) -> Counter:
+    """Character trigrams (within words) plus stemmed word tokens of a description."""
+    normalized = ' '.join(re.findall(r'[a-z0-9]+', str(text).lower()))
+    features = Counter(f"#{normalized[i:i + 3]}" for i in range(len(normalized) - 2))
+    features.update(f"w:{term}" for term in search_terms(normalized))
+    return features
+
+class MappingMatcher:
+    """
+    TF-IDF matrix over the indicators of GCG_MAPPING.csv.
+
+    Rows are L2-normalized character trigram + stemmed token vectors, so a batch
+    of extracted descriptions is matched with a single matrix product. The
+    matrix is rebuilt when the CSV changes on disk.
+    """
+    
+    def __init__(self, mapping_path: Path):
+        self.mapping_path = mapping_path
+        self.mtime_ns = None
+        self.lock = threading.Lock()
+    
+    def _load(self):
+        mtime_ns = self.mapping_path.stat().st_mtime_ns
+        if self.mtime_ns == mtime_ns:
+            return
+        mapping = pd.read_csv(self.mapping_path)
+        mapping = mapping[mapping['Type'] == 'indicator'].reset_index(drop=True)
+        features = [similarity_features(text) for text in mapping['Deskripsi']]
+        
+        vocabulary: Dict[str, int] = {}
+        for counts in features:
+            for feature in counts:
+                vocabulary.setdefault(feature, len(vocabulary))
+        document_frequency = np.zeros(len(vocabulary), dtype=np.float32)
+        for counts in features:
+            document_frequency[[vocabulary[feature] for feature in counts]] += 1
+        self.idf = np.log((1 + len(features)) / (1 + document_frequency)).astype(np.float32) + 1
+        # Features the mapping never uses still weigh on a query's norm (OCR noise)
+        self.unknown_idf = float(np.log(1 + len(features)) + 1)
+        
+        self.vocabulary = vocabulary
+        self.matrix = self._vectorize(features)[0]
+        self.mapping = mapping
+        self.mtime_ns = mtime_ns
+    
+    def _vectorize(self, features: List[Counter]) -> Tuple[np.ndarray, np.ndarray]:
+        """Normalized TF-IDF rows over the mapping vocabulary (and the norms used)."""
+        matrix = np.zeros((len(features), len(self.vocabulary)), dtype=np.float32)
+        unknown = np.zeros(len(features), dtype=np.float32)
+        for row, counts in enumerate(features):
+            for feature, count in counts.items():
+                column = self.vocabulary.get(feature)
+                if column is None:
+                    unknown[row] += (count * self.unknown_idf) ** 2
+                else:
+                    matrix[row, column] = count
+        matrix *= self.idf
+        norms = np.sqrt((matrix ** 2).sum(axis=1) + unknown)
+        norms[norms == 0] = 1
+        return matrix / norms[:, None], norms
+    
+    def match(self, descriptions: List[str]) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Canonical mapping rows, best index and cosine similarity per description."""
+        with self.lock:
+            self._load()
+            queries, _ = self._vectorize([similarity_features(text) for text in descriptions])
+            similarity = queries @ self.matrix.T
+            best = similarity.argmax(axis=1) if len(descriptions) else np.zeros(0, dtype=int)
+            confidence = similarity[np.arange(len(descriptions)), best] if len(descriptions) else np.zeros(0)
+            return self.mapping, best, confidence
+
+mapping_matcher = MappingMatcher(GCG_MAPPING_PATH)
+
+def reconcile_indicators(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Match extracted indicator rows to the canonical GCG mapping.
+
+    Each row needs a description ('deskripsi' or 'description') and may carry
+    its extracted 'section' and 'no'. Matched rows get the canonical Section,
+    No, Bobot and Jumlah_Parameter with a confidence (cosine similarity);
+    rows below RECONCILE_MIN_CONFIDENCE are reported as unmatched with their
+    best candidate.
+    """
+    started = time.perf_counter()
+    descriptions = [str(row.get('deskripsi', row.get('description', '')) or '') for row in rows]
+    mapping, best, confidence = mapping_matcher.match(descriptions)
+    
+    matched, unmatched = [], []
+    claimed = Counter(int(index) for index, score in zip(best, confidence) if score >= RECONCILE_MIN_CONFIDENCE)
+    for position, (row, index, score) in enumerate(zip(rows, best, confidence)):
+        canonical = mapping.iloc[int(index)]
+        candidate = {
+            'section': str(canonical['Section']),
+            'no': int(canonical['No']),
+            'bobot': float(canonical['Bobot']) if pd.notna(canonical['Bobot']) else None,
+            'jumlah_parameter': int(canonical['Jumlah_Parameter']) if pd.notna(canonical['Jumlah_Parameter']) else None,
+            'deskripsi': str(canonical['Deskripsi'])
+        }
+        entry = {'index': position, 'input': row, 'confidence': round(float(score), 4)}
+        if score < RECONCILE_MIN_CONFIDENCE:
+            unmatched.append({**entry, 'best_candidate': candidate})
+            continue
+        
+        extracted_no = pd.to_numeric(row.get('no'), errors='coerce')
+        matched.append({
+            **entry,
+            **candidate,
+            'section_changed': str(row.get('section', '')).strip() not in ('', candidate['section']),
+            'no_changed': pd.notna(extracted_no) and float(extracted_no) != candidate['no'],
+            # Several extracted rows resolved to the same canonical indicator
+            'ambiguous': claimed[int(index)] > 1
+        })
+    
+    return {
+        'matched': matched,
+        'unmatched': unmatched,
+        'total_rows': len(rows),
+        'matched_rows': len(matched),
+        'min_confidence': RECONCILE_MIN_CONFIDENCE,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+@app.route('/api/timeseries', methods=['GET'])
+def get_timeseries():
+    """
+    Skor/Capaian across years for one or many indicators.
+    
+    Query parameters:
+    - key: repeatable, 'III:18' for an indicator, 'III' for an aspect subtotal, 'total' for the year total
+    - from, to: (optional) year range
+    - rolling: (optional) window in years for rolling mean/min/max/std and year-over-year change
+    """
+    started = time.perf_counter()
+    raw_keys = [key for value in request.args.getlist('key') for key in value.split(',') if key.strip()]
+    if not raw_keys:
+        return jsonify({'success': False, 'error': 'At least one key is required'}), 400
+    try:
+        keys = [parse_series_key(key) for key in raw_keys]
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    year_from = request.args.get('from', type=int)
+    year_to = request.args.get('to', type=int)
+    window = request.args.get('rolling', type=int)
+    if window is not None and window < 1:
+        return jsonify({'success': False, 'error': 'rolling must be a positive number of years'}), 400
+    
+    try:
+        found = timeseries_index.lookup(load_assessment_df(), keys)
+        series = []
+        for raw_key, key in zip(raw_keys, keys):
+            points = [
+                point for point in found[key]
+                if (year_from is None or point['year'] >= year_from) and (year_to is None or point['year'] <= year_to)
+            ]
+            if window:
+                points = rolling_statistics(points, window)
+            series.append({
+                'key': raw_key.strip(),
+                'type': key[0],
+                'section': key[1],
+                'no': key[2],
+                'deskripsi': points[-1]['deskripsi'] if points else None,
+                'points': points
+            })
+        return jsonify({
+            'success': True,
+            'version': read_dataset_version(),
+            'series': series,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+    
+    except Exception as e:
+        print(f"❌ Error loading time series: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/gcg-mapping', methods=['GET'])
 def get_gcg_mapping():
     """
@@ -943,7 +3662,7 @@ def get_gcg_mapping():
     """
     try:
         # Path to GCG mapping CSV file
-        gcg_mapping_path = Path(__file__).parent / 'GCG_MAPPING.csv'
+        gcg_mapping_path = GCG_MAPPING_PATH
         
         if not gcg_mapping_path.exists():
             print(f"⚠️ GCG_MAPPING.csv not found at: {gcg_mapping_path}")
@@ -989,6 +3708,38 @@ def get_gcg_mapping():
         }), 500
 
 
+@app.route('/api/reconcile', methods=['POST'])
+def reconcile():
+    """
+    Reconcile extracted indicators against GCG_MAPPING.csv.
+    
+    Expected JSON, either:
+    - rows: [{deskripsi, section, no}, ...]
+    - fileId: a processed upload whose extracted indicators are reconciled
+    """
+    data = request.json or {}
+    rows = data.get('rows')
+    if rows is None and data.get('fileId'):
+        try:
+            uuid.UUID(str(data['fileId']))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid file id'}), 400
+        result = read_result_sidecar(str(data['fileId']))
+        if result is None:
+            return jsonify({'success': False, 'error': 'Result not found'}), 404
+        rows = (result.get('extractedData') or {}).get('sample_indicators', [])
+    if not isinstance(rows, list):
+        return jsonify({'success': False, 'error': 'rows or fileId is required'}), 400
+    if not GCG_MAPPING_PATH.exists():
+        return jsonify({'success': False, 'error': 'GCG mapping file not found'}), 404
+    
+    try:
+        return jsonify({'success': True, **reconcile_indicators(rows)})
+    except Exception as e:
+        print(f"❌ Error reconciling indicators: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 if __name__ == '__main__':
     print("🚀 Starting POS Data Cleaner 2 Web API")
     print(f"📁 Upload folder: {UPLOAD_FOLDER}")
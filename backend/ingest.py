@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion of historical GCG assessments
+
+Processes a directory (or manifest) of assessment documents with the core
+system across a process pool and saves every year into output.xlsx in one
+batched commit, using the same processing and save logic as the web API.
+Progress is checkpointed, so an interrupted run resumes where it stopped.
+
+Usage:
+    python ingest.py <directory|manifest.csv|manifest.txt> [--workers N] [--checkpoint PATH]
+                     [--auditor NAME] [--jenis-asesmen Internal] [--dry-run]
+
+A .txt manifest lists one file per line; a .csv manifest has a `path` column
+and optional `year`, `auditor` and `jenis_asesmen` columns.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Tuple
+
+import pandas as pd
+
+import app as backend
+
+DEFAULT_CHECKPOINT = Path(__file__).parent / 'outputs' / 'ingest_checkpoint.json'
+
+
+def collect_jobs(source: Path, defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Files to ingest with their per-file options, from a directory or a manifest."""
+    if source.is_dir():
+        paths = sorted(
+            path for path in source.rglob('*')
+            if path.is_file() and backend.allowed_file(path.name)
+        )
+        return [{'path': str(path.resolve()), **defaults} for path in paths]
+
+    if source.suffix.lower() == '.csv':
+        manifest = pd.read_csv(source, dtype=str).fillna('')
+        if 'path' not in manifest.columns:
+            raise ValueError(f"Manifest {source} needs a 'path' column")
+        rows = manifest.to_dict('records')
+    else:
+        rows = [{'path': line.strip()} for line in source.read_text().splitlines() if line.strip() and not line.startswith('#')]
+
+    jobs = []
+    for row in rows:
+        path = Path(row['path'])
+        if not path.is_absolute():
+            path = source.parent / path
+        job = {'path': str(path.resolve()), **defaults}
+        job.update({key: value for key, value in row.items() if key != 'path' and value != ''})
+        jobs.append(job)
+    return jobs
+
+
+def file_signature(path: Path) -> str:
+    """Cheap change detection for checkpointed files."""
+    stat = path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_checkpoint(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {'files': {}}
+
+
+def save_checkpoint(path: Path, checkpoint: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(json.dumps(checkpoint))
+    os.replace(tmp_path, path)
+
+
+def init_worker(page_workers: int):
+    # Every ingest process fans PDF pages out itself; share the cores between them
+    backend.PAGE_WORKERS = page_workers
+
+
+def process_file(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the core system on one file (in a worker process) and return its table."""
+    started = time.perf_counter()
+    source = Path(job['path'])
+    work_dir = Path(tempfile.mkdtemp(prefix='gcg_ingest_'))
+    try:
+        # Work on a copy so page chunks and outputs never land next to the source file
+        input_path = work_dir / backend.secure_filename(source.name)
+        shutil.copyfile(source, input_path)
+        output_path = work_dir / f"processed_{input_path.stem}.xlsx"
+        result = backend.process_document(input_path, output_path, backend.get_file_type(source.name))
+        outcome = {
+            'success': bool(result['success']) and result.get('frame') is not None,
+            'error': result.get('error') or (None if result.get('frame') is not None else 'Core system returned no table'),
+            'seconds': round(time.perf_counter() - started, 2)
+        }
+        if outcome['success']:
+            outcome['table'] = backend.table_payload(result['frame'])
+            outcome['metadata'] = result.get('metadata', {})
+        return outcome
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'seconds': round(time.perf_counter() - started, 2)}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def first_value(frame: pd.DataFrame, column: str) -> Optional[Any]:
+    if column not in frame.columns:
+        return None
+    values = frame[column].dropna()
+    values = values[values.astype(str).str.strip() != '']
+    return values.iloc[0] if len(values) > 0 else None
+
+
+def year_payload(frame: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Processed table as /api/save data rows and aspect summary rows.
+
+    Indicators become data rows; each aspect's header description and subtotal
+    values become its summary row, as the assessment page would send them.
+    """
+    types = frame['Type'].astype(str).str.lower()
+    indicators = frame[types == 'indicator']
+    data_rows = [
+        {
+            'id': str(int(no)) if pd.notna(no) else '',
+            'aspek': str(section) if pd.notna(section) else '',
+            'deskripsi': str(deskripsi) if pd.notna(deskripsi) else '',
+            'jumlah_parameter': jumlah_parameter,
+            'bobot': bobot,
+            'skor': skor,
+            'capaian': capaian,
+            'penjelasan': str(penjelasan) if pd.notna(penjelasan) else ''
+        }
+        for no, section, deskripsi, jumlah_parameter, bobot, skor, capaian, penjelasan in zip(
+            pd.to_numeric(indicators['No'], errors='coerce'), indicators['Section'], indicators['Deskripsi'],
+            indicators['Jumlah_Parameter'], indicators['Bobot'], indicators['Skor'],
+            indicators['Capaian'], indicators['Penjelasan']
+        )
+    ]
+
+    headers = frame[types == 'header'].drop_duplicates('Section').set_index('Section')
+    subtotals = frame[types == 'subtotal'].drop_duplicates('Section').set_index('Section')
+    summary_rows = []
+    for section in subtotals.index:
+        subtotal = subtotals.loc[section]
+        summary_rows.append({
+            'aspek': str(section),
+            'deskripsi': str(headers.loc[section, 'Deskripsi']) if section in headers.index else str(subtotal['Deskripsi']),
+            'jumlah_parameter': subtotal.get('Jumlah_Parameter'),
+            'bobot': subtotal.get('Bobot'),
+            'skor': subtotal.get('Skor'),
+            'capaian': subtotal.get('Capaian'),
+            'penjelasan': subtotal.get('Penjelasan')
+        })
+    return backend.json_records(pd.DataFrame(data_rows)), backend.json_records(pd.DataFrame(summary_rows))
+
+
+def resolve_year(job: Dict[str, Any], frame: pd.DataFrame, metadata: Dict[str, Any]) -> Optional[int]:
+    """Year from the manifest, the core system, the table or the filename (in that order)."""
+    for candidate in (job.get('year'), metadata.get('year'), first_value(frame, 'Tahun')):
+        if candidate is not None and str(candidate).strip().split('.')[0].isdigit():
+            return int(str(candidate).strip().split('.')[0])
+    match = re.search(r'(19|20)\d{2}', Path(job['path']).name)
+    return int(match.group(0)) if match else None
+
+
+def commit_years(entries: List[Tuple[Dict[str, Any], Dict[str, Any]]], dry_run: bool) -> Tuple[Dict[int, str], Optional[int]]:
+    """
+    Save every processed year into the dataset in one batched store.
+
+    Entries must be in job order (sorted paths or manifest order): later
+    files win when several files carry the same year, so the choice does not
+    depend on which worker finished first. A table that cannot be turned into
+    a year marks only its own file as failed. Returns the committed
+    year -> source file and the new dataset version.
+    """
+    export_date = datetime.now().date().isoformat()
+    years: Dict[int, pd.DataFrame] = {}
+    sources: Dict[int, str] = {}
+    for job, entry in entries:
+        try:
+            frame = pd.DataFrame(entry['table']['rows'], columns=entry['table']['columns'])
+            year = resolve_year(job, frame, entry.get('metadata', {}))
+            if year is None:
+                entry.update(status='failed', error='Could not determine the assessment year')
+                print(f"❌ {job['path']}: could not determine the assessment year")
+                continue
+
+            auditor = str(job.get('auditor') or entry.get('metadata', {}).get('penilai') or first_value(frame, 'Penilai') or 'unknown')
+            data_rows, summary_rows = year_payload(frame)
+            year_df, _, validation = backend.prepare_year(
+                data_rows, summary_rows, year, auditor, job.get('jenis_asesmen', 'Internal'), export_date
+            )
+        except Exception as e:
+            error = f"Unusable table: {type(e).__name__}: {e}"
+            entry.update(status='failed', error=error)
+            print(f"❌ {job['path']}: {error}")
+            continue
+        if year in sources:
+            print(f"⚠️ Year {year} appears in {sources[year]} and {job['path']}; keeping the latter")
+        if validation:
+            print(f"⚠️ {job['path']}: {len(validation)} subtotal(s) in the document differ from the computed values")
+        years[year] = year_df
+        sources[year] = job['path']
+        entry['year'] = year
+
+    if not years or dry_run:
+        return sources, None
+
+    with backend.dataset_lock:
+        df = backend.load_assessment_df()
+        for year, year_df in years.items():
+            df = backend.merge_year(df, year_df, year)
+        version = backend.store_assessment_df(df)
+    return sources, version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-ingest historical GCG assessments into output.xlsx')
+    parser.add_argument('source', type=Path, help='Directory of documents, or a .txt/.csv manifest')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2), help='Parallel core system processes')
+    parser.add_argument('--checkpoint', type=Path, default=DEFAULT_CHECKPOINT, help='Progress file used to resume interrupted runs')
+    parser.add_argument('--auditor', default=None, help='Penilai for files that do not state one')
+    parser.add_argument('--jenis-asesmen', default='Internal', help='Jenis_Asesmen for all files (default: Internal)')
+    parser.add_argument('--dry-run', action='store_true', help='Process and report, but do not write output.xlsx')
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        parser.error(f"{args.source} does not exist")
+
+    defaults = {'jenis_asesmen': args.jenis_asesmen}
+    if args.auditor:
+        defaults['auditor'] = args.auditor
+    jobs = collect_jobs(args.source, defaults)
+    checkpoint = load_checkpoint(args.checkpoint)
+    files = checkpoint['files']
+
+    pending = []
+    for job in jobs:
+        path = Path(job['path'])
+        if not path.exists():
+            files[job['path']] = {'status': 'failed', 'error': 'File not found'}
+            continue
+        entry = files.get(job['path'])
+        if entry and entry.get('signature') == file_signature(path) and entry['status'] in ('processed', 'committed'):
+            continue
+        pending.append(job)
+
+    skipped = len(jobs) - len(pending)
+    print(f"🚀 Ingesting {len(jobs)} file(s): {len(pending)} to process, {skipped} already done (checkpoint {args.checkpoint})")
+
+    started = time.perf_counter()
+    page_workers = max(1, (os.cpu_count() or 1) // max(1, args.workers))
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(page_workers,)) as pool:
+            futures = {pool.submit(process_file, job): job for job in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                job = futures[future]
+                outcome = future.result()
+                entry = {
+                    'signature': file_signature(Path(job['path'])),
+                    'status': 'processed' if outcome['success'] else 'failed',
+                    'seconds': outcome['seconds'],
+                    'error': outcome.get('error')
+                }
+                if outcome['success']:
+                    entry.update(table=outcome['table'], metadata=outcome.get('metadata', {}))
+                files[job['path']] = entry
+                save_checkpoint(args.checkpoint, checkpoint)
+                status = '✅' if outcome['success'] else f"❌ {outcome.get('error')}"
+                print(f"[{done}/{len(pending)}] {Path(job['path']).name} ({outcome['seconds']}s) {status}")
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted; progress is checkpointed, run again to resume")
+        sys.exit(130)
+    processing_seconds = time.perf_counter() - started
+
+    # One batched commit of everything processed but not yet saved (this run or an interrupted one)
+    jobs_by_path = {job['path']: job for job in jobs}
+    # In job order, not checkpoint (completion) order, so duplicate years resolve the same way every run
+    to_commit = [
+        (job, files[job['path']]) for job in jobs
+        if job['path'] in files and files[job['path']]['status'] == 'processed'
+    ]
+    sources, version = commit_years(to_commit, args.dry_run)
+    if version is not None:
+        for job, entry in to_commit:
+            if entry['status'] == 'processed':
+                entry['status'] = 'committed'
+                entry.pop('table', None)
+    save_checkpoint(args.checkpoint, checkpoint)
+
+    failed = {path: entry.get('error') for path, entry in files.items() if path in jobs_by_path and entry['status'] == 'failed'}
+    processed_now = len(pending) - sum(1 for job in pending if job['path'] in failed)
+    print("=" * 50)
+    print(f"📄 Files: {len(jobs)} total, {processed_now} processed, {skipped} from checkpoint, {len(failed)} failed")
+    if pending:
+        print(f"⏱️ Processing: {processing_seconds:.1f}s, {len(pending) / processing_seconds * 60:.1f} files/min with {args.workers} worker(s)")
+    if args.dry_run:
+        print(f"🧪 Dry run: {len(sources)} year(s) ready, output.xlsx not modified")
+    elif version is not None:
+        print(f"💾 Committed {len(sources)} year(s) {sorted(sources)} as dataset version {version}")
+    else:
+        print("💾 Nothing new to commit")
+    for path, error in failed.items():
+        print(f"   ❌ {path}: {error}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import pytest
+
+import app
+
+
+@pytest.fixture(autouse=True)
+def rule_based_stemmer(monkeypatch):
+    """Exercise the built-in stemmer even when Sastrawi is installed."""
+    monkeypatch.setattr(app, 'sastrawi_stemmer', None)
+    app.stem_indonesian.cache_clear()
+    yield
+    app.stem_indonesian.cache_clear()
+
+
+@pytest.mark.parametrize('words, stem', [
+    (['penilaian', 'nilai', 'menilai', 'dinilai'], 'nilai'),
+    (['kebijakan', 'bijak'], 'bijak'),
+    (['pengendalian', 'kendali', 'mengendalikan'], 'kendali'),
+    (['pengelolaan', 'kelola', 'mengelola'], 'kelola'),
+    (['pengawasan', 'mengawasi', 'awas'], 'awas'),
+    (['penetapan', 'menetapkan', 'ditetapkan', 'tetap'], 'tetap'),
+    (['pengesahan', 'disahkan', 'sah'], 'sah'),
+])
+def test_related_forms_share_a_stem(words, stem):
+    assert [app.stem_indonesian(word) for word in words] == [stem] * len(words)
+
+
+@pytest.mark.parametrize('word', ['direksi', 'informasi', 'regulasi'])
+def test_si_loanwords_keep_their_ending(word):
+    assert app.stem_indonesian(word) == word
+
+
+def test_search_terms_match_across_forms():
+    assert app.search_terms('Penilaian kebijakan') == app.search_terms('menilai bijak')
@@ -738,9 +738,21 @@ const PenilaianGCG = () => {
         };
       });
       
-      // Get sheet analysis and brief data from the processing result
-      const sheetAnalysis = extractedData.sheet_analysis;
-      const briefSheetData = extractedData.brief_sheet_data;
+      // Sheet analysis and brief data are computed lazily by the backend (XLSX uploads only)
+      let sheetAnalysis = extractedData.sheet_analysis;
+      let briefSheetData = extractedData.brief_sheet_data;
+      if (!sheetAnalysis && extractedData.sheet_analysis_url) {
+        try {
+          const analysisResponse = await fetch(extractedData.sheet_analysis_url);
+          if (analysisResponse.ok) {
+            const analysis = await analysisResponse.json();
+            sheetAnalysis = analysis.sheet_analysis;
+            briefSheetData = analysis.brief_sheet_data;
+          }
+        } catch (analysisError) {
+          console.warn('Sheet analysis unavailable:', analysisError);
+        }
+      }
       loadDataWithDetection(processedData, sheetAnalysis, briefSheetData);
       
       // Auto-update selected year if extracted from file